@@ -0,0 +1,167 @@
+"""
+Rolling-window activity counters
+Quiz submissions are counted into per-minute, per-hour and per-day buckets,
+per category and globally. Each worker aggregates counts in memory and flushes
+the deltas in one call, and rolling windows (last 15 minutes, 24 hours, 7 days)
+are answered by summing a fixed number of buckets, whatever the history size.
+
+The flush calls a database function that adds deltas atomically:
+
+    create function increment_activity_counters(deltas jsonb) returns void as $$
+        insert into activity_counters (bucket_size, bucket_start, category, count, score_sum)
+        select d->>'bucket_size', (d->>'bucket_start')::timestamp, d->>'category',
+               (d->>'count')::int, (d->>'score_sum')::float
+        from jsonb_array_elements(deltas) d
+        on conflict (bucket_size, bucket_start, category) do update
+        set count = activity_counters.count + excluded.count,
+            score_sum = activity_counters.score_sum + excluded.score_sum;
+    $$ language sql;
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+ALL_CATEGORIES = "*"
+BUCKET_SIZES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1)
+}
+# Window name -> (bucket size, number of buckets)
+WINDOWS = {
+    "Last 15 minutes": ("minute", 15),
+    "Last 24 hours": ("hour", 24),
+    "Last 7 days": ("day", 7)
+}
+
+
+def bucket_start(moment: datetime, bucket_size: str) -> datetime:
+    """Truncate a timestamp to the start of its bucket"""
+    if bucket_size == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if bucket_size == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class ActivityRecorder:
+    """Aggregates submissions in memory and flushes counter deltas periodically"""
+
+    def __init__(self, supabase: Client, flush_seconds: float):
+        self.supabase = supabase
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.deltas: Dict[Tuple[str, str, str], List[float]] = {}
+        self.thread = threading.Thread(target=self._run, name="activity-counters", daemon=True)
+        self.thread.start()
+
+    def record(self, categories: List[str], score: float, moment: datetime = None):
+        moment = moment or datetime.now()
+        with self.lock:
+            for bucket_size in BUCKET_SIZES:
+                start = bucket_start(moment, bucket_size).isoformat()
+                for category in set(categories) | {ALL_CATEGORIES}:
+                    delta = self.deltas.setdefault((bucket_size, start, category), [0, 0.0])
+                    delta[0] += 1
+                    delta[1] += score
+
+    def flush(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, {}
+        if not deltas:
+            return
+        try:
+            self.supabase.rpc('increment_activity_counters', {"deltas": [{
+                "bucket_size": bucket_size,
+                "bucket_start": start,
+                "category": category,
+                "count": count,
+                "score_sum": score_sum
+            } for (bucket_size, start, category), (count, score_sum) in deltas.items()]}).execute()
+        except Exception:
+            # Merge the deltas back so the next flush retries them
+            logger.exception("Activity counter flush failed")
+            with self.lock:
+                for key, (count, score_sum) in deltas.items():
+                    delta = self.deltas.setdefault(key, [0, 0.0])
+                    delta[0] += count
+                    delta[1] += score_sum
+
+    def _run(self):
+        last_prune = 0.0
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+            if time.monotonic() - last_prune > 3600:
+                last_prune = time.monotonic()
+                try:
+                    prune_counters(self.supabase)
+                except Exception:
+                    logger.exception("Activity counter pruning failed")
+
+
+@st.cache_resource
+def get_activity_recorder(_supabase: Client) -> ActivityRecorder:
+    """Get the process-wide activity recorder"""
+    return ActivityRecorder(_supabase, config.ACTIVITY_FLUSH_SECONDS)
+
+
+def record_submission(supabase: Client, questions: List[Dict[str, Any]], score: float):
+    """Count a quiz submission under each of its categories and globally"""
+    try:
+        categories = [q['category'] for q in questions if q.get('category')]
+        get_activity_recorder(supabase).record(categories, score)
+    except Exception as e:
+        st.error(f"Error recording activity: {e}")
+
+
+def get_bucket_counts(supabase: Client, bucket_size: str, buckets: int, category: str = ALL_CATEGORIES) -> List[Dict[str, Any]]:
+    """Get the most recent `buckets` buckets of one size, oldest first"""
+    since = bucket_start(datetime.now(), bucket_size) - BUCKET_SIZES[bucket_size] * (buckets - 1)
+    return supabase.table(config.TABLES['activity_counters']).select('bucket_start, count, score_sum') \
+        .eq('bucket_size', bucket_size) \
+        .eq('category', category) \
+        .gte('bucket_start', since.isoformat()) \
+        .order('bucket_start') \
+        .execute().data
+
+
+def get_window_activity(supabase: Client, window: str, category: str = ALL_CATEGORIES) -> Dict[str, float]:
+    """Submissions and average score over a rolling window"""
+    bucket_size, buckets = WINDOWS[window]
+    rows = get_bucket_counts(supabase, bucket_size, buckets, category)
+    count = sum(row['count'] for row in rows)
+    score_sum = sum(row['score_sum'] for row in rows)
+    return {"count": count, "average_score": score_sum / count if count else 0}
+
+
+def get_retained_activity(supabase: Client, category: str = ALL_CATEGORIES) -> Dict[str, float]:
+    """Submissions and average score over every retained day bucket"""
+    # Day buckets are kept for ACTIVITY_RETENTION_DAYS['day'] days, well under one page
+    rows = supabase.table(config.TABLES['activity_counters']).select('count, score_sum') \
+        .eq('bucket_size', 'day') \
+        .eq('category', category) \
+        .execute().data
+    count = sum(row['count'] for row in rows)
+    score_sum = sum(row['score_sum'] for row in rows)
+    return {"count": count, "average_score": score_sum / count if count else 0}
+
+
+def prune_counters(supabase: Client):
+    """Delete buckets older than their retention period"""
+    now = datetime.now()
+    for bucket_size, retention_days in config.ACTIVITY_RETENTION_DAYS.items():
+        supabase.table(config.TABLES['activity_counters']).delete() \
+            .eq('bucket_size', bucket_size) \
+            .lt('bucket_start', (now - timedelta(days=retention_days)).isoformat()) \
+            .execute()
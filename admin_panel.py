@@ -1,7 +1,19 @@
 import streamlit as st
 from supabase import Client
 from typing import List, Dict, Any
+from collections import Counter
 import pandas as pd
+from config import config
+from item_analysis import render_item_analysis
+from shared_cache import load_questions, load_categories, sync_shared_cache
+from media import render_media_admin
+from reports import render_batch_reports
+from enrollment import render_enrollment
+from telemetry import render_response_times
+from activity_counters import WINDOWS, get_window_activity, get_bucket_counts, get_retained_activity
+from change_feed import make_change, record_question_changes, INSERT, UPDATE, DELETE
+from question_bundles import render_bundle_admin
+from exam_scheduler import render_exam_scheduling
 
 def render_admin_panel(supabase: Client, user_email: str):
     """Render the admin panel with quiz management features"""
@@ -10,11 +22,19 @@ def render_admin_panel(supabase: Client, user_email: str):
     st.info(f"Logged in as: {user_email}")
     
     # Admin actions tabs
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9, tab10, tab11, tab12 = st.tabs([
         "📊 View Questions", 
         "➕ Add Question", 
         "✏️ Edit Question", 
-        "🗑️ Delete Question"
+        "🗑️ Delete Question",
+        "📈 Item Analysis",
+        "📦 Exam Bundles",
+        "🗓️ Scheduled Exams",
+        "🖼️ Images",
+        "📄 Reports",
+        "👥 Enrollment",
+        "📊 Statistics",
+        "⏲️ Response Times"
     ])
     
     with tab1:
@@ -28,15 +48,38 @@ def render_admin_panel(supabase: Client, user_email: str):
     
     with tab4:
         render_delete_question(supabase)
+    
+    with tab5:
+        render_item_analysis(supabase)
+    
+    with tab6:
+        render_bundle_admin(supabase)
+    
+    with tab7:
+        render_exam_scheduling(supabase)
+    
+    with tab8:
+        render_media_admin(supabase)
+    
+    with tab9:
+        render_batch_reports(supabase)
+    
+    with tab10:
+        render_enrollment(supabase)
+    
+    with tab11:
+        render_statistics_dashboard(supabase)
+    
+    with tab12:
+        render_response_times(supabase)
 
 def render_view_questions(supabase: Client):
     """Display all questions in a table format"""
     st.subheader("📋 All Quiz Questions")
     
     try:
-        # Fetch all questions
-        response = supabase.table('questions').select('*').order('category', 'created_at').execute()
-        questions = response.data
+        # Served from the shared cache, kept current by the change feed
+        questions = sorted(load_questions(supabase), key=lambda q: (q['category'], q.get('created_at') or ''))
         
         if not questions:
             st.warning("No questions found in the database.")
@@ -106,6 +149,8 @@ def render_add_question(supabase: Client):
                     response = supabase.table('questions').insert(new_question).execute()
                     
                     if response.data:
+                        record_question_changes(supabase, [make_change(INSERT, response.data[0]['id'], response.data[0])])
+                        sync_shared_cache(supabase)
                         st.success("✅ Question added successfully!")
                         st.rerun()
                     else:
@@ -177,6 +222,8 @@ def render_edit_question(supabase: Client):
                                     response = supabase.table('questions').update(updated_question).eq('id', question_id).execute()
                                     
                                     if response.data:
+                                        record_question_changes(supabase, [make_change(UPDATE, question_id, response.data[0])])
+                                        sync_shared_cache(supabase)
                                         st.success("✅ Question updated successfully!")
                                         st.rerun()
                                     else:
@@ -228,6 +275,8 @@ def render_delete_question(supabase: Client):
                         response = supabase.table('questions').delete().eq('id', question_id).execute()
                         
                         if response.data:
+                            record_question_changes(supabase, [make_change(DELETE, question_id)])
+                            sync_shared_cache(supabase)
                             st.success("✅ Question deleted successfully!")
                             st.rerun()
                         else:
@@ -262,36 +311,40 @@ def validate_question_form(question: str, option_a: str, option_b: str, option_c
     
     return True
 
-def get_quiz_statistics(supabase: Client) -> Dict[str, Any]:
-    """Get comprehensive quiz statistics"""
-    try:
-        # Question statistics
-        questions_response = supabase.table('questions').select('category').execute()
-        questions = questions_response.data
-        
-        # Quiz results statistics
-        results_response = supabase.table('quiz_results').select('score, completed_at').execute()
-        results = results_response.data
-        
-        stats = {
-            'total_questions': len(questions),
-            'categories': list(set([q['category'] for q in questions])),
-            'total_quizzes_taken': len(results),
-            'average_score': sum([r['score'] for r in results]) / len(results) if results else 0,
-            'recent_activity': len([r for r in results if r['completed_at'] > '2024-01-01'])
-        }
-        
-        return stats
-        
-    except Exception as e:
-        st.error(f"Error fetching statistics: {e}")
-        return {}
+@st.cache_data(ttl=config.ADMIN_REPORT_CACHE_SECONDS, show_spinner=False)
+def get_quiz_statistics(_supabase: Client) -> Dict[str, Any]:
+    """Get comprehensive quiz statistics (cached across admin reruns)"""
+    # Question counts come from the shared cache; the results total is the planner's
+    # estimate (exact only while the table is small), so no count(*) over quiz_results
+    questions = load_questions(_supabase)
+    results_response = _supabase.table('quiz_results').select('id', count='estimated').limit(1).execute()
+    # Average over the day counters instead of scanning every score; they only cover
+    # submissions since the counters were deployed
+    counted = get_retained_activity(_supabase)
+    
+    return {
+        'total_questions': len(questions),
+        'categories': load_categories(_supabase),
+        'category_counts': dict(Counter(q['category'] for q in questions)),
+        'total_quizzes_taken': results_response.count or 0,
+        'average_score': counted['average_score'],
+        'counted_quizzes': counted['count'],
+        # Rolling window from the activity counters instead of a full-history scan
+        'recent_activity': get_window_activity(_supabase, "Last 7 days")['count']
+    }
 
 def render_statistics_dashboard(supabase: Client):
     """Render a statistics dashboard for admins"""
     st.subheader("📊 Statistics Dashboard")
     
-    stats = get_quiz_statistics(supabase)
+    try:
+        if st.button("Refresh", key="refresh_statistics"):
+            get_quiz_statistics.clear()
+            get_activity_report.clear()
+        stats = get_quiz_statistics(supabase)
+    except Exception as e:
+        st.error(f"Error fetching statistics: {e}")
+        stats = {}
     
     if stats:
         col1, col2, col3, col4 = st.columns(4)
@@ -303,17 +356,54 @@ def render_statistics_dashboard(supabase: Client):
             st.metric("Categories", len(stats['categories']))
         
         with col3:
-            st.metric("Quizzes Taken", stats['total_quizzes_taken'])
+            st.metric("Quizzes Taken", stats['total_quizzes_taken'],
+                      help="Estimated from the database's table statistics once there are many results")
         
         with col4:
-            st.metric("Avg Score", f"{stats['average_score']:.1f}%")
+            st.metric(
+                "Avg Score (since counters started)",
+                f"{stats['average_score']:.1f}%",
+                help=f"Over the {stats['counted_quizzes']} quizzes recorded by the activity counters, "
+                     f"which start at deployment and keep {config.ACTIVITY_RETENTION_DAYS['day']} days"
+            )
         
         # Category breakdown
-        if stats['categories']:
+        if stats['category_counts']:
             st.subheader("📈 Questions by Category")
-            category_counts = {}
-            for category in stats['categories']:
-                category_response = supabase.table('questions').select('id').eq('category', category).execute()
-                category_counts[category] = len(category_response.data)
-            
-            st.bar_chart(pd.DataFrame(list(category_counts.items()), columns=['Category', 'Count']))
+            st.bar_chart(pd.DataFrame(list(stats['category_counts'].items()), columns=['Category', 'Count']))
+    
+    render_activity_windows(supabase, stats.get('categories', []))
+
+@st.cache_data(ttl=config.ACTIVITY_REPORT_CACHE_SECONDS, show_spinner=False)
+def get_activity_report(_supabase: Client, category: str) -> Dict[str, Any]:
+    """Rolling-window activity and per-minute throughput for a category (cached across admin reruns)"""
+    return {
+        'windows': {window: get_window_activity(_supabase, window, category) for window in WINDOWS},
+        # Submissions per minute over the last hour
+        'throughput': get_bucket_counts(_supabase, "minute", 60, category)
+    }
+
+def render_activity_windows(supabase: Client, categories: List[str]):
+    """Show rolling-window activity and recent throughput from the activity counters"""
+    st.subheader("⏱️ Recent Activity")
+    
+    try:
+        category = st.selectbox("Category", ["All categories"] + sorted(categories), key="activity_category")
+        category_filter = "*" if category == "All categories" else category
+        
+        report = get_activity_report(supabase, category_filter)
+        
+        columns = st.columns(len(WINDOWS))
+        for column, window in zip(columns, WINDOWS):
+            activity = report['windows'][window]
+            with column:
+                st.metric(window, activity['count'], f"avg {activity['average_score']:.1f}%", delta_color="off")
+        
+        # Submissions per minute over the last hour
+        rows = report['throughput']
+        if rows:
+            throughput = pd.DataFrame(rows).set_index('bucket_start')[['count']]
+            st.line_chart(throughput)
+        
+    except Exception as e:
+        st.error(f"Error fetching activity: {e}")
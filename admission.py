@@ -0,0 +1,159 @@
+"""
+Admission control for backend calls
+Token buckets per user and globally, plus a bounded FIFO wait queue, keep
+bursts of quiz starts, submissions and auth calls under a configured QPS ceiling
+
+BACKEND_MAX_QPS is the ceiling for the whole deployment. Each process enforces
+its own buckets without coordinating, so it takes a 1/APP_WORKERS share of the
+global rate and burst. This keeps admission free of shared state on the hot
+path, at the cost of idle workers' shares going unused.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import streamlit as st
+
+from config import config
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted (queue full or wait too long)"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_available(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        with self.lock:
+            self._refill(time.monotonic())
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def try_consume(self) -> bool:
+        """Take a token if one is available"""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def is_full(self) -> bool:
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens >= self.capacity
+
+
+class AdmissionController:
+    """
+    Admits backend calls in FIFO order without exceeding the global rate.
+
+    A caller first waits for its own per-user token (so one user cannot hog the
+    queue), then joins a bounded global queue and is admitted when it reaches
+    the head and a global token is free.
+    """
+
+    def __init__(self, global_rate: float, global_burst: float, user_rate: float, user_burst: float,
+                 max_queue: int, max_wait_seconds: float):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.user_buckets: Dict[str, TokenBucket] = {}
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.queue = deque()
+        self.condition = threading.Condition()
+
+    def _user_bucket(self, user_key: str) -> TokenBucket:
+        with self.condition:
+            bucket = self.user_buckets.get(user_key)
+            if bucket is None:
+                if len(self.user_buckets) > 10000:
+                    # Idle users have full buckets and can be forgotten safely
+                    self.user_buckets = {k: b for k, b in self.user_buckets.items() if not b.is_full()}
+                bucket = self.user_buckets[user_key] = TokenBucket(self.user_rate, self.user_burst)
+            return bucket
+
+    def acquire(self, user_key: str, on_position: Optional[Callable[[int], None]] = None):
+        """Block until the call is admitted; raise AdmissionRejected if it cannot be"""
+        deadline = time.monotonic() + self.max_wait_seconds
+
+        user_bucket = self._user_bucket(user_key)
+        while not user_bucket.try_consume():
+            wait = user_bucket.time_until_available()
+            if time.monotonic() + wait > deadline:
+                raise AdmissionRejected("Too many requests, please slow down")
+            time.sleep(wait)
+
+        ticket = object()
+        with self.condition:
+            if len(self.queue) >= self.max_queue:
+                raise AdmissionRejected("Server is busy, please try again shortly")
+            self.queue.append(ticket)
+
+        try:
+            while True:
+                with self.condition:
+                    position = self.queue.index(ticket) + 1
+                    if position == 1 and self.global_bucket.try_consume():
+                        self.queue.popleft()
+                        self.condition.notify_all()
+                        return
+                if on_position:
+                    on_position(position)
+                if time.monotonic() > deadline:
+                    raise AdmissionRejected("Server is busy, please try again shortly")
+                with self.condition:
+                    self.condition.wait(timeout=min(0.25, max(self.global_bucket.time_until_available(), 0.01)))
+        except BaseException:
+            # Also on Streamlit's rerun/stop exceptions from on_position, or a dead ticket would block the queue
+            with self.condition:
+                if ticket in self.queue:
+                    self.queue.remove(ticket)
+                    self.condition.notify_all()
+            raise
+
+
+@st.cache_resource
+def get_admission_controller() -> AdmissionController:
+    """Get the process-wide admission controller"""
+    workers = max(1, config.APP_WORKERS)
+    return AdmissionController(
+        config.BACKEND_MAX_QPS / workers,
+        max(1, config.BACKEND_BURST / workers),
+        config.USER_MAX_QPS,
+        config.USER_BURST,
+        config.ADMISSION_QUEUE_SIZE,
+        config.ADMISSION_MAX_WAIT_SECONDS
+    )
+
+
+def admit(user_key: str, action: str) -> bool:
+    """Wait for admission to the backend, showing the queue position; False if rejected"""
+    placeholder = st.empty()
+
+    def show_position(position: int):
+        placeholder.info(f"⏳ High demand right now. You are number {position} in line to {action}...")
+
+    try:
+        get_admission_controller().acquire(user_key, show_position)
+        return True
+    except AdmissionRejected as e:
+        st.warning(f"{e}. We couldn't {action} right now.")
+        return False
+    finally:
+        placeholder.empty()
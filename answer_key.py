@@ -0,0 +1,46 @@
+"""
+Server-held answer key
+Quizzes carry only question stems and options. Correct answers and
+explanations are looked up on the server when they are needed: from the exam
+bundle for bundled exams, otherwise from the shared question cache, with the
+database as a fallback for questions the cache no longer has.
+"""
+
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, Optional
+
+from supabase import Client
+
+from question_bundles import load_bundle
+from shared_cache import QUIZ_FIELDS, load_answer_field
+
+
+def quiz_payload(questions: List[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Strip questions down to what the quiz shows"""
+    return [{field: question.get(field) for field in QUIZ_FIELDS} for question in questions]
+
+
+def _lookup(supabase: Client, field: str, questions: List[Mapping[str, Any]], bundle_id: Optional[str]) -> Mapping[str, Any]:
+    if bundle_id:
+        # Bundled exams are graded against the bundle, not later edits to the bank
+        values = {str(q['id']): q[field] for q in load_bundle(bundle_id).questions(('id', field))}
+    else:
+        values = load_answer_field(supabase, field, (q['category'] for q in questions))
+
+    question_ids = [str(q['id']) for q in questions]
+    missing = [question_id for question_id in question_ids if question_id not in values]
+    if missing:
+        response = supabase.table('questions').select(f'id, {field}').in_('id', missing).execute()
+        values.update({str(row['id']): row[field] for row in response.data})
+
+    return MappingProxyType({question_id: values.get(question_id) for question_id in question_ids})
+
+
+def get_answer_key(supabase: Client, questions: List[Mapping[str, Any]], bundle_id: Optional[str] = None) -> Mapping[str, str]:
+    """Read-only map of question ID to correct option for a quiz's questions"""
+    return _lookup(supabase, 'correct_answer', questions, bundle_id)
+
+
+def get_explanations(supabase: Client, questions: List[Mapping[str, Any]], bundle_id: Optional[str] = None) -> Mapping[str, str]:
+    """Read-only map of question ID to explanation for a quiz's questions"""
+    return _lookup(supabase, 'explanation', questions, bundle_id)
@@ -2,9 +2,27 @@ import streamlit as st
 import os
 from datetime import datetime, timedelta
 import time
+import uuid
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import pandas as pd
+from autosave import autosave_attempt, load_saved_attempt, clear_saved_attempt
+from review_queue import record_review_results, get_due_reviews
+from admission import admit
+from shared_cache import QUIZ_FIELDS, load_categories, load_quiz_questions, sync_shared_cache
+from change_feed import make_change, record_question_changes, INSERT
+from question_bundles import load_bundle
+from results_view import render_results
+from answer_key import quiz_payload, get_answer_key
+from media import get_media_for_questions, render_media
+from reports import render_attempt_downloads
+from session_store import load_quiz_session, save_quiz_session
+from activity_counters import record_submission
+from telemetry import start_tracking, record_answer, export_telemetry
+from exam_scheduler import (
+    get_exam_scheduler, get_user_cohorts, get_user_exam_events, get_exam_attempts, personal_start_time, window_end,
+    parse_time, utc_now, mark_exam_started, mark_exam_submitted, STARTED, SUBMITTED
+)
 
 # Load environment variables
 load_dotenv()
@@ -98,26 +116,32 @@ def seed_sample_questions(supabase: Client):
     ]
     
     try:
-        for question in sample_questions:
-            supabase.table('questions').insert(question).execute()
+        response = supabase.table('questions').insert(sample_questions).execute()
+        record_question_changes(supabase, [make_change(INSERT, row['id'], row) for row in response.data])
+        sync_shared_cache(supabase)
         st.success("Sample questions seeded successfully!")
     except Exception as e:
         st.error(f"Error seeding questions: {e}")
 
-def get_questions(supabase: Client, category=None):
-    """Get questions from the database"""
+def get_categories(supabase: Client):
+    """Get the quiz categories"""
     try:
-        if category:
-            response = supabase.table('questions').select('*').eq('category', category).execute()
-        else:
-            response = supabase.table('questions').select('*').execute()
-        return response.data
+        return load_categories(supabase)
+    except Exception as e:
+        st.error(f"Error fetching categories: {e}")
+        return []
+
+def get_questions(supabase: Client, category):
+    """Get a category's questions without answers or explanations"""
+    try:
+        # Served from the cache shared by all workers on this node
+        return load_quiz_questions(supabase, category)
     except Exception as e:
         st.error(f"Error fetching questions: {e}")
         return []
 
-def save_quiz_result(supabase: Client, user_id, quiz_data, score, answers):
-    """Save quiz results to the database"""
+def save_quiz_result(supabase: Client, user_id, quiz_data, score, answers, telemetry=None):
+    """Save quiz results to the database; return whether they were saved"""
     try:
         # Ensure all data is JSON serializable
         result = {
@@ -125,17 +149,23 @@ def save_quiz_result(supabase: Client, user_id, quiz_data, score, answers):
             "quiz_data": quiz_data,
             "score": float(score),  # Ensure score is a number
             "answers": answers,
+            "telemetry": telemetry,
             "completed_at": datetime.now().isoformat()
         }
         
         supabase.table('quiz_results').insert(result).execute()
         st.success("Quiz result saved successfully!")
+        return True
     except Exception as e:
         st.error(f"Error saving quiz result: {e}")
+        return False
 
 # Authentication functions
 def sign_up(supabase: Client, email, password):
     """Sign up a new user"""
+    if not admit(email, "sign up"):
+        return None
+    
     try:
         response = supabase.auth.sign_up({
             "email": email,
@@ -148,6 +178,9 @@ def sign_up(supabase: Client, email, password):
 
 def sign_in(supabase: Client, email, password):
     """Sign in an existing user"""
+    if not admit(email, "sign in"):
+        return None
+    
     try:
         response = supabase.auth.sign_in_with_password({
             "email": email,
@@ -166,23 +199,83 @@ def sign_out(supabase: Client):
         st.session_state.current_quiz = None
         st.session_state.quiz_answers = {}
         st.session_state.quiz_completed = False
+        st.session_state.pop('saved_attempt', None)
+        st.session_state.pop('session_version', None)
+        st.session_state.pop('session_blob', None)
+        st.session_state.pop('session_milestone', None)
+        forget_learner_schedule()
         st.rerun()
     except Exception as e:
         st.error(f"Error during sign out: {e}")
 
 # Quiz functions
-def start_quiz(questions, time_limit_minutes=15):
-    """Start a new quiz session"""
+def forget_learner_schedule():
+    """Reload the learner's cohorts, exam attempts and due reviews on the next rerun"""
+    for key in ('exam_cohorts', 'exam_attempts', 'due_reviews'):
+        st.session_state.pop(key, None)
+
+def get_session_exam_attempts(supabase: Client, user_id, exam_events):
+    """The learner's attempts for some exam events, kept in the session until a start or submit changes them"""
+    event_ids = sorted(str(event['id']) for event in exam_events)
+    cached = st.session_state.get('exam_attempts')
+    if cached and cached['event_ids'] == event_ids:
+        return cached['attempts']
+    
+    attempts = get_exam_attempts(supabase, user_id, [event['id'] for event in exam_events])
+    if attempts is None:
+        # Not cached, so the next rerun tries again
+        return {}
+    st.session_state.exam_attempts = {"event_ids": event_ids, "attempts": attempts}
+    return attempts
+
+def start_quiz(questions, time_limit_minutes=15, bundle_id=None, event_id=None, started_at=None):
+    """Start a new quiz session (from `started_at` when resuming a scheduled exam); False if not admitted"""
+    if st.session_state.user and not admit(st.session_state.user.id, "start the quiz"):
+        return False
+    
+    # The session only holds stems and options; answers stay on the server until scoring
+    questions = quiz_payload(questions)
+    started_at = started_at or datetime.now()
     st.session_state.current_quiz = {
         "questions": questions,
         "time_limit": time_limit_minutes,
-        "start_time": datetime.now()
+        "start_time": started_at,
+        "bundle_id": bundle_id,
+        "event_id": event_id,
+        "attempt_id": uuid.uuid4().hex
     }
-    st.session_state.quiz_start_time = time.time()
+    st.session_state.quiz_start_time = started_at.timestamp()
     st.session_state.quiz_answers = {}
     st.session_state.quiz_completed = False
+    start_tracking(questions, {})
+    forget_learner_schedule()
+    return True
+
+def resume_quiz(attempt):
+    """Restore a saved in-progress quiz into the session, keeping the original timer"""
+    st.session_state.current_quiz = attempt['current_quiz']
+    st.session_state.quiz_start_time = attempt['quiz_start_time']
+    st.session_state.quiz_answers = attempt['quiz_answers']
+    st.session_state.quiz_completed = False
+    start_tracking(attempt['current_quiz']['questions'], attempt['quiz_answers'])
+    
+    # Pre-select the saved answers in the question widgets
+    for i, question in enumerate(attempt['current_quiz']['questions']):
+        question_id = str(question['id'])
+        if question_id in attempt['quiz_answers']:
+            st.session_state[f"question_{i}_{question_id}"] = attempt['quiz_answers'][question_id]
+
+def apply_quiz_session(session):
+    """Replace this session's quiz state with one stored by another worker"""
+    if session['current_quiz']:
+        resume_quiz(session)
+    else:
+        st.session_state.current_quiz = None
+        st.session_state.quiz_start_time = None
+        st.session_state.quiz_answers = {}
+    st.session_state.quiz_completed = session['quiz_completed']
 
-def calculate_score(questions, answers):
+def calculate_score(questions, answers, answer_key):
     """Calculate quiz score"""
     if not answers:
         return 0
@@ -193,7 +286,7 @@ def calculate_score(questions, answers):
     for question in questions:
         question_id = str(question['id'])
         if question_id in answers:
-            if answers[question_id] == question['correct_answer']:
+            if answers[question_id] == answer_key.get(question_id):
                 correct += 1
     
     return (correct / total) * 100 if total > 0 else 0
@@ -208,6 +301,10 @@ def display_quiz_timer():
         if remaining <= 0:
             st.error("Time's up! Quiz will be submitted automatically.")
             submit_quiz()
+            if not st.session_state.quiz_completed:
+                # Not admitted or not saved; the answers stay autosaved until a retry succeeds
+                if st.button("Retry submission"):
+                    st.rerun()
             return False
         
         minutes = int(remaining // 60)
@@ -222,32 +319,59 @@ def display_quiz_timer():
 
 def submit_quiz():
     """Submit the quiz and mark as completed"""
-    if not st.session_state.current_quiz or not st.session_state.quiz_answers:
+    # An attempt with no answers is still submitted (scored 0), e.g. when the timer runs out
+    if not st.session_state.current_quiz:
         st.warning("No quiz to submit!")
         return
     
+    # Admit before any backend reads; leave the quiz open (and autosaved) so the learner can retry
+    if st.session_state.user and not admit(st.session_state.user.id, "submit your quiz"):
+        return
+    
     questions = st.session_state.current_quiz['questions']
-    score = calculate_score(questions, st.session_state.quiz_answers)
+    supabase = init_supabase()
+    try:
+        answer_key = get_answer_key(supabase, questions, st.session_state.current_quiz.get('bundle_id'))
+    except Exception as e:
+        # Leave the quiz open so the learner can submit again
+        st.error(f"Error loading answer key: {e}")
+        return
+    score = calculate_score(questions, st.session_state.quiz_answers, answer_key)
     
     # Save results
-    supabase = init_supabase()
     if st.session_state.user:
         # Create a serializable copy of quiz data
         quiz_data_for_db = {
-            "questions": questions,
+            # The correct answer at submission time, for reports and certificates ('-' if the question was deleted)
+            "questions": [dict(q, correct_answer=answer_key.get(str(q['id'])) or '-') for q in questions],
+            "bundle_id": st.session_state.current_quiz.get('bundle_id'),
+            "event_id": st.session_state.current_quiz.get('event_id'),
+            "attempt_id": st.session_state.current_quiz['attempt_id'],
             "time_limit": st.session_state.current_quiz['time_limit'],
             "start_time": st.session_state.current_quiz['start_time'].isoformat() if hasattr(st.session_state.current_quiz['start_time'], 'isoformat') else str(st.session_state.current_quiz['start_time'])
         }
         
         user_id = st.session_state.user.id
         
-        save_quiz_result(
+        saved = save_quiz_result(
             supabase, 
             user_id, 
             quiz_data_for_db, 
             score, 
-            st.session_state.quiz_answers
+            st.session_state.quiz_answers,
+            export_telemetry()
         )
+        if not saved:
+            # Keep the quiz open and its autosave intact so the learner can submit again
+            return
+        
+        if st.session_state.current_quiz.get('event_id'):
+            # A scheduled exam can only be taken once
+            mark_exam_submitted(supabase, st.session_state.current_quiz['event_id'], user_id)
+        clear_saved_attempt(supabase, user_id)
+        record_review_results(supabase, user_id, questions, st.session_state.quiz_answers, answer_key)
+        record_submission(supabase, questions, score)
+        forget_learner_schedule()
     
     # Mark quiz as completed - results will be displayed in main()
     st.session_state.quiz_completed = True
@@ -261,6 +385,9 @@ def main():
     # Initialize Supabase
     supabase = init_supabase()
     
+    # Prepares scheduled exams in the background
+    get_exam_scheduler(supabase)
+    
     # Sidebar for authentication
     with st.sidebar:
         st.header("Authentication")
@@ -313,13 +440,89 @@ def main():
         st.info("Please sign in to access the quiz app.")
         return
     
+    # Pick up the quiz session if another worker served this learner last
+    stored_session = load_quiz_session(st.session_state.user.id)
+    if stored_session:
+        apply_quiz_session(stored_session)
+    if st.session_state.pop('session_conflict', False):
+        st.warning("Your quiz was updated from another window; showing the latest version.")
+    
     # Quiz selection
     if not st.session_state.current_quiz:
+        # Offer to resume an attempt interrupted by a refresh, disconnect or restart
+        if 'saved_attempt' not in st.session_state:
+            st.session_state.saved_attempt = load_saved_attempt(supabase, st.session_state.user.id)
+        
+        if st.session_state.saved_attempt:
+            st.info("You have an unfinished quiz. Would you like to resume it?")
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Resume Quiz"):
+                    resume_quiz(st.session_state.saved_attempt)
+                    st.session_state.saved_attempt = None
+                    st.rerun()
+            with col2:
+                if st.button("Discard"):
+                    clear_saved_attempt(supabase, st.session_state.user.id)
+                    st.session_state.saved_attempt = None
+                    st.rerun()
+            return
+        
         st.header("Select a Quiz")
         
+        # Spaced-repetition review of previously missed questions (read once per start or submit, not per rerun)
+        if 'due_reviews' not in st.session_state:
+            st.session_state.due_reviews = get_due_reviews(supabase, st.session_state.user.id)
+        due_reviews = st.session_state.due_reviews
+        if due_reviews:
+            st.info(f"You have {len(due_reviews)} question(s) due for review.")
+            if st.button("Start Review") and start_quiz(due_reviews):
+                autosave_attempt(supabase, st.session_state.user.id, immediate=True)
+                st.rerun()
+        
+        # Scheduled exams for the learner's cohorts; events come from the scheduler's poll, not a query per rerun
+        if st.session_state.get('exam_cohorts') is None:
+            st.session_state.exam_cohorts = get_user_cohorts(supabase, st.session_state.user.id)
+        exam_events = get_user_exam_events(supabase, st.session_state.exam_cohorts or [])
+        if exam_events:
+            st.subheader("Scheduled Exams")
+            now = utc_now()
+            attempts = get_session_exam_attempts(supabase, st.session_state.user.id, exam_events)
+            
+            for event in exam_events:
+                user_start = personal_start_time(event, st.session_state.user.id)
+                attempt = attempts.get(str(event['id']), {})
+                status = attempt.get('status')
+                
+                if status == SUBMITTED:
+                    st.success(f"**{event['name']}** submitted.")
+                elif now < user_start:
+                    st.info(f"**{event['name']}** opens at {user_start.astimezone().strftime('%H:%M:%S')} for {event['duration_minutes']} minutes.")
+                elif now < window_end(event):
+                    st.write(f"**{event['name']}** is open ({event['duration_minutes']} minutes).")
+                    label = "Resume Exam" if status == STARTED else "Start Exam"
+                    if st.button(label, key=f"start_exam_{event['id']}"):
+                        try:
+                            exam_questions = load_bundle(event['bundle_id']).questions(QUIZ_FIELDS)
+                        except Exception as e:
+                            st.error(f"Error loading exam: {e}")
+                            return
+                        
+                        # A started attempt keeps its original timer
+                        started_at = parse_time(attempt['started_at']) if status == STARTED and attempt.get('started_at') else utc_now()
+                        if not start_quiz(exam_questions, event['duration_minutes'], bundle_id=event['bundle_id'],
+                                          event_id=event['id'], started_at=started_at):
+                            return
+                        mark_exam_started(supabase, event, st.session_state.user.id, st.session_state.current_quiz['start_time'])
+                        autosave_attempt(supabase, st.session_state.user.id, immediate=True)
+                        st.rerun()
+        
+        # Exam bundles are only offered through scheduled events, within their cohort and window
+        if exam_events:
+            st.subheader("Practice Quizzes")
+        
         # Get available categories
-        questions = get_questions(supabase)
-        categories = list(set([q['category'] for q in questions])) if questions else []
+        categories = get_categories(supabase)
         
         if not categories:
             st.warning("No quizzes available. Please contact an administrator.")
@@ -329,11 +532,11 @@ def main():
         
         if st.button("Start Quiz"):
             category_questions = get_questions(supabase, selected_category)
-            if category_questions:
-                start_quiz(category_questions)
-                st.rerun()
-            else:
+            if not category_questions:
                 st.error("No questions found for this category.")
+            elif start_quiz(category_questions):
+                autosave_attempt(supabase, st.session_state.user.id, immediate=True)
+                st.rerun()
     
     # Quiz taking interface
     elif st.session_state.current_quiz and not st.session_state.quiz_completed:
@@ -346,10 +549,19 @@ def main():
         # Quiz questions
         questions = st.session_state.current_quiz['questions']
         
+        # Image attachments are looked up once per attempt
+        attempt_id = st.session_state.current_quiz['attempt_id']
+        if st.session_state.get('quiz_media_attempt') != attempt_id:
+            st.session_state.quiz_media = get_media_for_questions(supabase, [q['id'] for q in questions])
+            st.session_state.quiz_media_attempt = attempt_id
+        
         for i, question in enumerate(questions):
             st.subheader(f"Question {i+1}")
             st.write(question['question'])
             
+            media_items = st.session_state.quiz_media.get(str(question['id']), [])
+            render_media(supabase, media_items, 'question', f"media_{i}")
+            
             options = {
                 'a': question['option_a'],
                 'b': question['option_b'],
@@ -362,17 +574,29 @@ def main():
             # Use a more reliable key format
             radio_key = f"question_{i}_{question_id}"
             
+            # No pre-selection, so every answer (including 'a') is an explicit, timed choice
             answer = st.radio(
                 "Select your answer:",
                 options=list(options.keys()),
                 format_func=lambda x: f"{x.upper()}. {options[x]}",
-                key=radio_key
+                index=None,
+                key=radio_key,
+                on_change=record_answer,
+                args=(question_id, radio_key)
             )
             
+            for option_key in options:
+                if any(item['target'] == option_key for item in media_items):
+                    st.caption(f"Option {option_key.upper()}")
+                    render_media(supabase, media_items, option_key, f"media_{i}")
+            
             # Store the answer immediately
             if answer:
                 st.session_state.quiz_answers[question_id] = answer
         
+        # Debounced autosave so a refresh or disconnect can resume the attempt
+        autosave_attempt(supabase, st.session_state.user.id)
+        
         # Submit button
         if st.button("Submit Quiz"):
             submit_quiz()
@@ -382,56 +606,29 @@ def main():
     elif st.session_state.quiz_completed:
         st.header("Quiz Results")
         
-        # Add a loading spinner for better UX
-        with st.spinner("Preparing your results..."):
-            # Display the quiz results that were calculated in submit_quiz()
-            if st.session_state.current_quiz and st.session_state.quiz_answers:
-                questions = st.session_state.current_quiz['questions']
-                score = calculate_score(questions, st.session_state.quiz_answers)
-                
-                st.success(f"Quiz completed! Your score: {score:.1f}%")
-                
-                # Show detailed results with optimized rendering
-                st.subheader("Detailed Results")
-                
-                # Pre-calculate all options mapping for better performance
-                all_options = {}
-                for question in questions:
-                    question_id = str(question['id'])
-                    all_options[question_id] = {
-                        'a': question['option_a'],
-                        'b': question['option_b'],
-                        'c': question['option_c'],
-                        'd': question['option_d']
-                    }
-                
-                # Display results efficiently
-                for i, question in enumerate(questions):
-                    question_id = str(question['id'])
-                    user_answer_key = st.session_state.quiz_answers.get(question_id, 'No answer')
-                    correct_answer_key = question['correct_answer']
-                    is_correct = user_answer_key == correct_answer_key
-                    
-                    # Get the full answer text from pre-calculated options
-                    options = all_options[question_id]
-                    user_answer_text = options.get(user_answer_key, 'No answer') if user_answer_key != 'No answer' else 'No answer'
-                    correct_answer_text = options.get(correct_answer_key, 'Unknown')
-                    
-                    with st.expander(f"Question {i+1}: {question['question']}"):
-                        st.write(f"**Your answer:** {user_answer_text}")
-                        st.write(f"**Correct answer:** {correct_answer_text}")
-                        st.write(f"**Explanation:** {question['explanation']}")
-                        
-                        if is_correct:
-                            st.success("✅ Correct!")
-                        else:
-                            st.error("❌ Incorrect!")
-                
-                if st.button("Take Another Quiz"):
-                    st.session_state.current_quiz = None
-                    st.session_state.quiz_answers = {}
-                    st.session_state.quiz_completed = False
-                    st.rerun()
+        # Reset before rendering anything else so starting over stays cheap
+        if st.button("Take Another Quiz"):
+            st.session_state.current_quiz = None
+            st.session_state.quiz_answers = {}
+            st.session_state.quiz_completed = False
+            st.session_state.pop('results_cache', None)
+            st.session_state.pop('shown_explanations', None)
+            st.rerun()
+        
+        if st.session_state.current_quiz:
+            render_results(
+                supabase,
+                st.session_state.current_quiz['attempt_id'],
+                st.session_state.current_quiz['questions'],
+                st.session_state.quiz_answers,
+                st.session_state.current_quiz.get('bundle_id')
+            )
+            render_attempt_downloads(supabase, st.session_state.user, st.session_state.current_quiz['attempt_id'])
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Runs on st.rerun()/st.stop() too, so every state change reaches the store
+        if st.session_state.user:
+            save_quiz_session(st.session_state.user.id)
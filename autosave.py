@@ -0,0 +1,235 @@
+"""
+Autosave for in-progress quiz attempts
+Persists quiz state with debounced, coalesced writes so an attempt survives
+browser refreshes, websocket drops and server restarts. With an external
+session store (sqlite or postgres) the session store persists the attempt
+instead, and only previously autosaved attempts are read and cleared here.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+from debounced_writer import DebouncedWriter
+from question_bundles import load_bundle
+from shared_cache import QUIZ_FIELDS
+from answer_key import quiz_payload
+
+
+def serialize_attempt(user_id: str, current_quiz: Dict[str, Any], quiz_answers: Dict[str, str],
+                      quiz_start_time: float) -> Dict[str, Any]:
+    """Build a JSON serializable attempt record from quiz session state"""
+    start_time = current_quiz.get('start_time')
+    bundle_id = current_quiz.get('bundle_id')
+    return {
+        "user_id": user_id,
+        "quiz_data": {
+            # Bundled exams are restored from the bundle, so only its ID is stored
+            "questions": None if bundle_id else [dict(q) for q in current_quiz['questions']],
+            "bundle_id": bundle_id,
+            "event_id": current_quiz.get('event_id'),
+            "attempt_id": current_quiz.get('attempt_id'),
+            "time_limit": current_quiz['time_limit'],
+            "start_time": start_time.isoformat() if hasattr(start_time, 'isoformat') else str(start_time)
+        },
+        "answers": dict(quiz_answers),
+        "started_at": float(quiz_start_time),
+        "updated_at": datetime.now().isoformat()
+    }
+
+
+def deserialize_attempt(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a stored attempt record back into quiz session state values"""
+    quiz_data = record['quiz_data']
+    try:
+        start_time = datetime.fromisoformat(quiz_data['start_time'])
+    except (TypeError, ValueError):
+        start_time = datetime.fromtimestamp(record['started_at'])
+
+    bundle_id = quiz_data.get('bundle_id')
+    # Attempts saved before quizzes became answer-free may still carry answers
+    questions = load_bundle(bundle_id).questions(QUIZ_FIELDS) if bundle_id else quiz_payload(quiz_data['questions'])
+
+    return {
+        "current_quiz": {
+            "questions": questions,
+            "time_limit": quiz_data['time_limit'],
+            "start_time": start_time,
+            "bundle_id": bundle_id,
+            "event_id": quiz_data.get('event_id'),
+            "attempt_id": quiz_data.get('attempt_id') or uuid.uuid4().hex
+        },
+        "quiz_answers": dict(record.get('answers') or {}),
+        "quiz_start_time": float(record['started_at'])
+    }
+
+
+class SupabaseAttemptStore:
+    """Stores in-progress attempts in the quiz_attempts table (one row per user)"""
+
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+        self.table = config.TABLES['quiz_attempts']
+
+    def save(self, record: Dict[str, Any]):
+        self.supabase.table(self.table).upsert(record, on_conflict='user_id').execute()
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        response = self.supabase.table(self.table).select('*').eq('user_id', user_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def delete(self, user_id: str):
+        self.supabase.table(self.table).delete().eq('user_id', user_id).execute()
+
+
+class LocalAttemptStore:
+    """Stores in-progress attempts in a local SQLite file"""
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_attempts (user_id TEXT PRIMARY KEY, record TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def save(self, record: Dict[str, Any]):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO quiz_attempts (user_id, record) VALUES (?, ?)",
+                (record['user_id'], json.dumps(record))
+            )
+            self.conn.commit()
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT record FROM quiz_attempts WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, user_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM quiz_attempts WHERE user_id = ?", (user_id,))
+            self.conn.commit()
+
+
+class AutosaveWriter(DebouncedWriter):
+    """
+    Debounced attempt writer: a burst of answer changes results in a single write.
+
+    discard() bumps the user's generation while holding the user's write lock, so a
+    record queued or in flight before the discard is never saved or re-queued after it.
+    """
+
+    def __init__(self, store, debounce_seconds: float, min_interval_seconds: float):
+        super().__init__(debounce_seconds, min_interval_seconds, "quiz-autosave")
+        self.store = store
+        self.generations: Dict[str, int] = {}
+
+    def schedule(self, record: Dict[str, Any]):
+        """Queue a record for writing, replacing any pending record for the same user"""
+        with self.lock:
+            generation = self.generations.get(record['user_id'], 0)
+        super().schedule(record['user_id'], (record, generation))
+
+    def discard(self, user_id: str):
+        """Drop any pending record and remove the stored attempt"""
+        with self._write_lock(user_id):
+            with self.lock:
+                self.generations[user_id] = self.generations.get(user_id, 0) + 1
+                self.pending.pop(user_id, None)
+                self.pending_since.pop(user_id, None)
+                self.last_write.pop(user_id, None)
+            self.store.delete(user_id)
+
+    def save(self, user_id: str, item: Tuple[Dict[str, Any], int]):
+        record, generation = item
+        with self.lock:
+            if self.generations.get(user_id, 0) != generation:
+                return  # Discarded since it was queued
+        self.store.save(record)
+
+    def should_retry(self, user_id: str, item: Tuple[Dict[str, Any], int]) -> bool:
+        return self.generations.get(user_id, 0) == item[1]
+
+    def forget(self, user_id: str):
+        self.generations.pop(user_id, None)
+
+
+@st.cache_resource
+def get_attempt_store(_supabase: Client):
+    """Get the configured attempt store (Supabase table or local SQLite file)"""
+    if config.AUTOSAVE_BACKEND == "local":
+        os.makedirs(os.path.dirname(config.AUTOSAVE_LOCAL_PATH) or ".", exist_ok=True)
+        return LocalAttemptStore(config.AUTOSAVE_LOCAL_PATH)
+    return SupabaseAttemptStore(_supabase)
+
+
+@st.cache_resource
+def get_autosave_writer(_supabase: Client) -> AutosaveWriter:
+    """Get the process-wide autosave writer"""
+    return AutosaveWriter(
+        get_attempt_store(_supabase),
+        config.AUTOSAVE_DEBOUNCE_SECONDS,
+        config.AUTOSAVE_MIN_INTERVAL_SECONDS
+    )
+
+
+def autosave_attempt(supabase: Client, user_id: str, immediate: bool = False):
+    """Persist the current session's in-progress quiz for the user"""
+    if not st.session_state.current_quiz or st.session_state.quiz_completed:
+        return
+
+    # An external session store already persists the attempt and restores it on the
+    # learner's next run; writing a second copy here would double the write load
+    if config.SESSION_STORE_BACKEND != "memory":
+        return
+
+    record = serialize_attempt(
+        user_id,
+        st.session_state.current_quiz,
+        st.session_state.quiz_answers,
+        st.session_state.quiz_start_time
+    )
+
+    writer = get_autosave_writer(supabase)
+
+    # Skip writes when nothing changed since the last rerun
+    fingerprint = json.dumps(record['answers'], sort_keys=True)
+    if immediate or st.session_state.get('autosave_fingerprint') != fingerprint:
+        st.session_state.autosave_fingerprint = fingerprint
+        writer.schedule(record)
+        if immediate:
+            writer.flush(user_id)
+
+    # Background writes cannot reach the page, so failures are reported on the learner's next run
+    error = writer.take_error(user_id)
+    if error:
+        st.error(f"Error autosaving quiz (will retry): {error}")
+
+
+def load_saved_attempt(supabase: Client, user_id: str) -> Optional[Dict[str, Any]]:
+    """Load the user's saved in-progress attempt, if any"""
+    try:
+        record = get_attempt_store(supabase).load(user_id)
+        return deserialize_attempt(record) if record else None
+    except Exception as e:
+        st.error(f"Error loading saved quiz: {e}")
+        return None
+
+
+def clear_saved_attempt(supabase: Client, user_id: str):
+    """Remove the user's saved in-progress attempt"""
+    try:
+        get_autosave_writer(supabase).discard(user_id)
+    except Exception as e:
+        st.error(f"Error clearing saved quiz: {e}")
@@ -0,0 +1,175 @@
+"""
+Question change feed
+Every add, edit and delete of a question is appended to a change log with a
+monotonic version number, so caches and workers can fetch the changes since the
+version they hold and apply them instead of reloading the whole question bank.
+
+In Supabase the log is written by a trigger in the same transaction as the
+question write, so bulk and out-of-band writes are covered and a write cannot
+succeed without its log entry:
+
+    create function log_question_change() returns trigger as $$
+    begin
+        insert into question_changes (operation, question_id, data, changed_at)
+        values (lower(tg_op), coalesce(new.id, old.id)::text,
+                case when tg_op = 'DELETE' then null else to_jsonb(new) end, now());
+        return null;
+    end;
+    $$ language plpgsql;
+
+    create trigger questions_change_feed after insert or update or delete on questions
+        for each row execute function log_question_change();
+
+Versions come from a sequence, so they are allocated in insert order but become
+visible in commit order: a reader can see version 7 before a slower transaction
+commits version 6. Readers therefore stop at the first gap and only skip it once
+it is older than CHANGE_FEED_GAP_GRACE_SECONDS (a rolled-back transaction leaves
+a permanent gap).
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+
+def make_change(operation: str, question_id, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build a change log entry (the version is assigned by the log)"""
+    return {
+        "operation": operation,
+        "question_id": str(question_id),
+        "data": dict(data) if data is not None else None,
+        "changed_at": datetime.now().isoformat()
+    }
+
+
+class SupabaseChangeLog:
+    """Change log stored in the question_changes table (version is a bigserial key)"""
+
+    # Entries are written by the questions trigger, not by the app
+    written_by_trigger = True
+
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+        self.table = config.TABLES['question_changes']
+
+    def append(self, changes: List[Dict[str, Any]]) -> int:
+        response = self.supabase.table(self.table).insert(changes).execute()
+        return max(change['version'] for change in response.data)
+
+    def since(self, version: int, limit: int) -> List[Dict[str, Any]]:
+        return self.supabase.table(self.table).select('*') \
+            .gt('version', version) \
+            .order('version') \
+            .limit(limit) \
+            .execute().data
+
+    def latest_version(self) -> int:
+        response = self.supabase.table(self.table).select('version').order('version', desc=True).limit(1).execute()
+        return response.data[0]['version'] if response.data else 0
+
+
+class LocalChangeLog:
+    """In-process stand-in for the change log, for tests and single-worker setups"""
+
+    written_by_trigger = False
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.changes: List[Dict[str, Any]] = []
+
+    def append(self, changes: List[Dict[str, Any]]) -> int:
+        with self.lock:
+            for change in changes:
+                self.changes.append(dict(change, version=len(self.changes) + 1))
+            return len(self.changes)
+
+    def since(self, version: int, limit: int) -> List[Dict[str, Any]]:
+        with self.lock:
+            # Versions are 1-based list positions
+            return [dict(change) for change in self.changes[version:version + limit]]
+
+    def latest_version(self) -> int:
+        with self.lock:
+            return len(self.changes)
+
+
+@st.cache_resource
+def get_change_log(_supabase: Client):
+    """Get the configured change log (Supabase table or local stand-in)"""
+    if config.CHANGE_FEED_BACKEND == "local":
+        return LocalChangeLog()
+    return SupabaseChangeLog(_supabase)
+
+
+def record_question_changes(supabase: Client, changes: List[Dict[str, Any]]) -> Optional[int]:
+    """Append changes to the feed and return the new version (a no-op when the database trigger logs them)"""
+    if not changes:
+        return None
+    try:
+        change_log = get_change_log(supabase)
+        if change_log.written_by_trigger:
+            return None
+        return change_log.append(changes)
+    except Exception as e:
+        st.error(f"Error recording question changes: {e}")
+        return None
+
+
+def gap_expired(change: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """Whether a missing version before `change` is old enough to be a rollback rather than in flight"""
+    changed_at = datetime.fromisoformat(change['changed_at'])
+    now = now or datetime.now(changed_at.tzinfo)
+    return now - changed_at > timedelta(seconds=config.CHANGE_FEED_GAP_GRACE_SECONDS)
+
+
+def read_changes(change_log, version: int, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Every change after `version` in version order, stopping at a gap that may still be filled"""
+    changes = []
+    expected = version + 1
+    while True:
+        batch = change_log.since(version, config.CHANGE_FEED_PAGE_SIZE)
+        for change in batch:
+            if change['version'] != expected and not gap_expired(change, now):
+                return changes
+            changes.append(change)
+            expected = change['version'] + 1
+        if len(batch) < config.CHANGE_FEED_PAGE_SIZE:
+            return changes
+        version = batch[-1]['version']
+
+
+def get_changes_since(supabase: Client, version: int) -> List[Dict[str, Any]]:
+    """Get every change after `version`, in version order"""
+    return read_changes(get_change_log(supabase), version)
+
+
+def safe_latest_version(change_log, now: Optional[datetime] = None) -> int:
+    """The newest version with no unexpired gap below it among recent changes"""
+    latest = change_log.latest_version()
+    start = max(0, latest - config.CHANGE_FEED_PAGE_SIZE)
+    recent = change_log.since(start, config.CHANGE_FEED_PAGE_SIZE)
+    if not recent:
+        return latest
+    # Changes before the window are old enough to treat as settled
+    contiguous = read_changes(change_log, recent[0]['version'] - 1, now)
+    return contiguous[-1]['version'] if contiguous else recent[0]['version'] - 1
+
+
+def apply_changes(questions: List[Dict[str, Any]], changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply changes to a question list; applying a change twice is harmless"""
+    by_id = {str(question['id']): question for question in questions}
+    for change in changes:
+        if change['operation'] == DELETE:
+            by_id.pop(change['question_id'], None)
+        else:
+            by_id[change['question_id']] = change['data']
+    return list(by_id.values())
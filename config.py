@@ -12,6 +12,8 @@ class Config:
     # Supabase Configuration
     SUPABASE_URL = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+    SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")  # Only needed for bulk enrollment
+    SUPABASE_PAGE_SIZE = 1000  # PostgREST's default maximum rows per request
     
     # Admin Configuration
     ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "admin@example.com")
@@ -19,6 +21,96 @@ class Config:
     # Quiz Configuration
     DEFAULT_QUIZ_TIME_MINUTES = 15
     MAX_QUESTIONS_PER_QUIZ = 50
+    RESULTS_PAGE_SIZE = 10
+    
+    # Autosave Configuration
+    AUTOSAVE_BACKEND = os.getenv("AUTOSAVE_BACKEND", "supabase")  # "supabase" or "local"
+    AUTOSAVE_LOCAL_PATH = os.getenv("AUTOSAVE_LOCAL_PATH", ".quiz_data/quiz_attempts.db")
+    AUTOSAVE_DEBOUNCE_SECONDS = 2
+    AUTOSAVE_MIN_INTERVAL_SECONDS = 10
+    
+    # Review Configuration
+    REVIEW_SESSION_SIZE = 20
+    
+    # Item Analysis Configuration
+    ITEM_ANALYSIS_PAGE_SIZE = 1000  # At most SUPABASE_PAGE_SIZE
+    ITEM_EASY_THRESHOLD = 0.9
+    ITEM_HARD_THRESHOLD = 0.2
+    ITEM_MIN_DISCRIMINATION = 0.2
+    ADMIN_REPORT_CACHE_SECONDS = 300  # Admin tabs render on every rerun; reports refresh at most this often
+    
+    # Admission Control Configuration
+    BACKEND_MAX_QPS = float(os.getenv("BACKEND_MAX_QPS", "50"))  # For the whole deployment
+    BACKEND_BURST = 100
+    APP_WORKERS = int(os.getenv("APP_WORKERS", "1"))  # App processes across all nodes; each gets an equal share
+    USER_MAX_QPS = 1
+    USER_BURST = 5
+    ADMISSION_QUEUE_SIZE = 500
+    ADMISSION_MAX_WAIT_SECONDS = 30
+    
+    # Shared Cache Configuration (one directory per node, shared by all workers)
+    SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", ".quiz_data/cache")
+    
+    # Change Feed Configuration
+    CHANGE_FEED_BACKEND = os.getenv("CHANGE_FEED_BACKEND", "supabase")  # "supabase" or "local"
+    CHANGE_FEED_POLL_SECONDS = 5
+    CHANGE_FEED_PAGE_SIZE = 1000
+    CHANGE_FEED_GAP_GRACE_SECONDS = 300  # A version gap older than this is a rolled-back write
+    
+    # Media Configuration
+    MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "supabase")  # "supabase" or "local"
+    MEDIA_BUCKET = os.getenv("MEDIA_BUCKET", "question-media")
+    MEDIA_LOCAL_DIR = os.getenv("MEDIA_LOCAL_DIR", ".quiz_data/media")
+    MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", ".quiz_data/media_cache")
+    MEDIA_CACHE_MAX_MB = 512
+    MEDIA_WEBP_QUALITY = 80
+    
+    # Report Configuration
+    REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", ".quiz_data/reports")
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+    REPORT_BATCH_WORKERS = int(os.getenv("REPORT_BATCH_WORKERS", "1"))  # Separate pool, so cohort batches never delay learners
+    REPORT_QUERY_CHUNK = 200
+    CERTIFICATE_PASS_SCORE = 70
+    
+    # Session Store Configuration
+    SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")  # "memory", "sqlite" or "postgres"
+    SESSION_STORE_SQLITE_PATH = os.getenv("SESSION_STORE_SQLITE_PATH", ".quiz_data/sessions.db")
+    SESSION_STORE_POSTGRES_DSN = os.getenv("SESSION_STORE_POSTGRES_DSN", "")
+    SESSION_STORE_POSTGRES_MAX_CONNECTIONS = 20  # Per process; concurrent reruns beyond this get an error
+    SESSION_STORE_DEBOUNCE_SECONDS = 1
+    SESSION_STORE_MIN_INTERVAL_SECONDS = 5
+    
+    # Enrollment Configuration
+    ENROLLMENT_CONCURRENCY = 8
+    ENROLLMENT_MAX_RETRIES = 4
+    ENROLLMENT_INSERT_BATCH = 500
+    COHORT_MEMBERS_PAGE_SIZE = 100  # Members shown per page in the enrollment panel
+    
+    # Activity Counter Configuration
+    ACTIVITY_FLUSH_SECONDS = 5
+    ACTIVITY_REPORT_CACHE_SECONDS = 60  # At most one minute bucket, so the recent-activity report stays live
+    ACTIVITY_RETENTION_DAYS = {
+        "minute": 2,
+        "hour": 60,
+        "day": 730
+    }
+    
+    # Telemetry Configuration
+    TELEMETRY_HISTOGRAM_BINS = 48
+    TELEMETRY_LONG_DWELL_FACTOR = 2.0
+    
+    # Exam Bundle Configuration
+    BUNDLE_DIR = os.getenv("BUNDLE_DIR", ".quiz_data/bundles")  # Per-node copy
+    BUNDLE_BACKEND = os.getenv("BUNDLE_BACKEND", "supabase")  # "supabase" (shared bucket) or "local" (one node)
+    BUNDLE_BUCKET = os.getenv("BUNDLE_BUCKET", "exam-bundles")
+    BUNDLE_LIST_CACHE_SECONDS = 60  # Bundles compiled on other nodes are listed within this long
+    
+    # Exam Scheduling Configuration
+    EXAM_PREWARM_LEAD_MINUTES = 10
+    EXAM_SCHEDULER_POLL_SECONDS = 30
+    EXAM_ATTEMPT_INSERT_BATCH = 500
+    EXAM_PREPARE_LEASE_SECONDS = 300  # A claim older than this is taken over by another worker
+    EXAM_MAX_WINDOW_MINUTES = 24 * 60  # Longest start window; bounds how far back open events are looked up
     
     # UI Configuration
     PAGE_TITLE = "🧠 Accounting Quiz App"
@@ -29,7 +121,15 @@ class Config:
     # Database Configuration
     TABLES = {
         "questions": "questions",
-        "quiz_results": "quiz_results"
+        "quiz_results": "quiz_results",
+        "quiz_attempts": "quiz_attempts",
+        "review_items": "review_items",
+        "exam_events": "exam_events",
+        "exam_attempts": "exam_attempts",
+        "cohort_members": "cohort_members",
+        "question_changes": "question_changes",
+        "question_media": "question_media",
+        "activity_counters": "activity_counters"
     }
     
     # Quiz Categories
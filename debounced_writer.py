@@ -0,0 +1,127 @@
+"""
+Debounced background writes
+Shared by the autosave and session store writers: each key's pending item is
+replaced by newer ones and written by a background thread once the key has
+been quiet for a while, so a burst of changes costs a single write.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional
+
+# Keys idle this long lose their bookkeeping once the writer tracks many keys
+IDLE_KEY_SECONDS = 3600
+MAX_TRACKED_KEYS = 10000
+
+
+class DebouncedWriter(ABC):
+    """
+    Debounced, coalescing writer shared by every session in the process.
+
+    Each call to schedule() replaces the pending item for that key. An item is
+    written once it has been quiet for `debounce_seconds`, and never sooner than
+    `min_interval_seconds` after the previous write for the same key. Writes for
+    one key are serialized, and a failed write is retried on a later tick unless
+    a newer item replaced it. Subclasses implement save().
+    """
+
+    def __init__(self, debounce_seconds: float, min_interval_seconds: float, name: str):
+        self.debounce_seconds = debounce_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.pending: Dict[str, Any] = {}
+        self.pending_since: Dict[str, float] = {}
+        self.last_write: Dict[str, float] = {}
+        self.write_locks: Dict[str, threading.Lock] = {}
+        self.errors: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    @abstractmethod
+    def save(self, key: str, item: Any):
+        """Write one item (called with the key's write lock held)"""
+
+    def should_retry(self, key: str, item: Any) -> bool:
+        """Whether a failed item is still worth writing (called with self.lock held)"""
+        return True
+
+    def forget(self, key: str):
+        """Drop subclass bookkeeping for an idle key (called with self.lock held)"""
+
+    def schedule(self, key: str, item: Any):
+        """Queue an item for writing, replacing any pending item for the same key"""
+        with self.lock:
+            self.pending[key] = item
+            self.pending_since[key] = time.monotonic()
+        self.wakeup.set()
+
+    def flush(self, key: str):
+        """Write any pending item for the key immediately"""
+        with self.lock:
+            item = self.pending.pop(key, None)
+            self.pending_since.pop(key, None)
+        if item is not None:
+            self._write(key, item)
+
+    def has_pending(self, key: str) -> bool:
+        with self.lock:
+            return key in self.pending
+
+    def take_error(self, key: str) -> Optional[str]:
+        """Pop the last background write failure for the key, if any"""
+        with self.lock:
+            return self.errors.pop(key, None)
+
+    def _write_lock(self, key: str) -> threading.Lock:
+        with self.lock:
+            return self.write_locks.setdefault(key, threading.Lock())
+
+    def _write(self, key: str, item: Any):
+        with self._write_lock(key):
+            try:
+                self.save(key, item)
+                with self.lock:
+                    self.errors.pop(key, None)
+            except Exception as e:
+                # Keep the item pending so the next tick retries it; the session reports the error
+                with self.lock:
+                    self.errors[key] = str(e)
+                    if key not in self.pending and self.should_retry(key, item):
+                        self.pending[key] = item
+                        self.pending_since[key] = time.monotonic()
+            finally:
+                with self.lock:
+                    self.last_write[key] = time.monotonic()
+
+    def _due(self, now: float):
+        due = []
+        with self.lock:
+            for key, since in list(self.pending_since.items()):
+                quiet = now - since >= self.debounce_seconds
+                spaced = now - self.last_write.get(key, 0) >= self.min_interval_seconds
+                if quiet and spaced:
+                    due.append((key, self.pending.pop(key)))
+                    del self.pending_since[key]
+        return due
+
+    def _forget_idle(self, now: float):
+        with self.lock:
+            if len(self.last_write) <= MAX_TRACKED_KEYS:
+                return
+            for key, written in list(self.last_write.items()):
+                if now - written > IDLE_KEY_SECONDS and key not in self.pending:
+                    del self.last_write[key]
+                    self.write_locks.pop(key, None)
+                    self.errors.pop(key, None)
+                    self.forget(key)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(timeout=self.debounce_seconds)
+            self.wakeup.clear()
+            now = time.monotonic()
+            for key, item in self._due(now):
+                self._write(key, item)
+            self._forget_idle(now)
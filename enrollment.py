@@ -0,0 +1,201 @@
+"""
+Bulk learner enrollment and cohort management
+Ingests a roster file, provisions accounts through the Supabase auth admin API
+with bounded concurrency and retries, and records cohort membership in the
+cohort_members table (indexed on cohort) for reporting and exam assignment.
+
+Cohort sizes are counted in the database, so the summary is one small response
+whatever the number of members:
+
+    create function cohort_member_counts() returns table (cohort text, members bigint) as $$
+        select cohort, count(*) from cohort_members group by cohort;
+    $$ language sql stable;
+"""
+
+import csv
+import io
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+
+import streamlit as st
+from supabase import Client, create_client
+
+from config import config
+from pagination import fetch_all
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+CREATED = "created"
+EXISTING = "existing"
+FAILED = "failed"
+
+
+def parse_roster(data: bytes, default_cohort: str) -> Dict[str, Any]:
+    """Parse a CSV roster with an `email` column and an optional `cohort` column"""
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8-sig')))
+    fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+    if 'email' not in fields:
+        raise ValueError("The roster needs an 'email' column")
+
+    learners, invalid, seen = [], [], set()
+    for line_number, row in enumerate(reader, start=2):
+        email = (row.get(fields['email']) or '').strip().lower()
+        cohort = (row.get(fields['cohort']) or '').strip() if 'cohort' in fields else ''
+        cohort = cohort or default_cohort
+        if not EMAIL_PATTERN.match(email) or not cohort:
+            invalid.append(line_number)
+            continue
+        if (email, cohort) not in seen:
+            seen.add((email, cohort))
+            learners.append({"email": email, "cohort": cohort})
+    return {"learners": learners, "invalid_lines": invalid}
+
+
+def is_already_registered(error: Exception) -> bool:
+    message = str(error).lower()
+    return "already" in message and ("registered" in message or "exists" in message)
+
+
+def is_retryable(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(hint in message for hint in ("429", "rate limit", "timeout", "timed out", "502", "503", "504", "connection"))
+
+
+def provision_account(admin: Client, email: str) -> Dict[str, Any]:
+    """Invite one learner, retrying transient failures with exponential backoff"""
+    for attempt in range(config.ENROLLMENT_MAX_RETRIES + 1):
+        try:
+            response = admin.auth.admin.invite_user_by_email(email)
+            return {"email": email, "status": CREATED, "user_id": response.user.id}
+        except Exception as e:
+            if is_already_registered(e):
+                return {"email": email, "status": EXISTING, "user_id": None}
+            if attempt == config.ENROLLMENT_MAX_RETRIES or not is_retryable(e):
+                return {"email": email, "status": FAILED, "error": str(e)}
+            time.sleep(min(30, 2 ** attempt) * (0.5 + random.random()))
+
+
+def existing_user_ids(admin: Client, emails: set) -> Dict[str, str]:
+    """Resolve user IDs for accounts that already existed, paging through the user list"""
+    found, page = {}, 1
+    while emails - set(found):
+        users = admin.auth.admin.list_users(page=page, per_page=1000)
+        if not users:
+            break
+        for user in users:
+            if user.email and user.email.lower() in emails:
+                found[user.email.lower()] = user.id
+        page += 1
+    return found
+
+
+@st.cache_resource
+def get_admin_client() -> Optional[Client]:
+    """Supabase client with the service role key, needed for the auth admin API"""
+    if not config.SUPABASE_URL or not config.SUPABASE_SERVICE_ROLE_KEY:
+        return None
+    return create_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_ROLE_KEY)
+
+
+def add_cohort_members(supabase: Client, members: List[Dict[str, Any]]):
+    """Upsert cohort memberships in batches"""
+    table = config.TABLES['cohort_members']
+    batch_size = config.ENROLLMENT_INSERT_BATCH
+    for i in range(0, len(members), batch_size):
+        supabase.table(table).upsert(members[i:i + batch_size], on_conflict='cohort,user_id').execute()
+
+
+def get_cohort_summary(supabase: Client) -> Dict[str, int]:
+    """Member count per cohort"""
+    response = supabase.rpc('cohort_member_counts', {}).execute()
+    return {row['cohort']: row['members'] for row in response.data}
+
+
+def get_cohort_members(supabase: Client, cohort: str) -> List[Dict[str, Any]]:
+    """Members of one cohort (served by the cohort index)"""
+    table = config.TABLES['cohort_members']
+    return fetch_all(lambda: supabase.table(table).select('user_id, email').eq('cohort', cohort).order('user_id'))
+
+
+def get_cohort_members_page(supabase: Client, cohort: str, page: int, page_size: int = None) -> List[Dict[str, Any]]:
+    """One page (numbered from 1) of a cohort's members, in user ID order"""
+    page_size = page_size or config.COHORT_MEMBERS_PAGE_SIZE
+    start = (page - 1) * page_size
+    return supabase.table(config.TABLES['cohort_members']).select('user_id, email') \
+        .eq('cohort', cohort) \
+        .order('user_id') \
+        .range(start, start + page_size - 1) \
+        .execute().data
+
+
+def enroll_learners(supabase: Client, admin: Client, learners: List[Dict[str, Any]], progress=None) -> List[Dict[str, Any]]:
+    """Provision accounts concurrently and add every learner to their cohort"""
+    emails = sorted(set(learner['email'] for learner in learners))
+    results = {}
+    with ThreadPoolExecutor(max_workers=config.ENROLLMENT_CONCURRENCY) as pool:
+        futures = [pool.submit(provision_account, admin, email) for email in emails]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[result['email']] = result
+            if progress:
+                progress(done / len(emails), f"Provisioned {done} of {len(emails)} accounts")
+
+    existing = {email for email, result in results.items() if result['status'] == EXISTING}
+    if existing:
+        for email, user_id in existing_user_ids(admin, existing).items():
+            results[email]['user_id'] = user_id
+
+    members = [{
+        "cohort": learner['cohort'],
+        "user_id": results[learner['email']]['user_id'],
+        "email": learner['email']
+    } for learner in learners if results[learner['email']].get('user_id')]
+    add_cohort_members(supabase, members)
+    return list(results.values())
+
+
+def render_enrollment(supabase: Client):
+    """Admin interface for bulk enrollment and cohorts"""
+    st.subheader("👥 Bulk Enrollment")
+
+    admin = get_admin_client()
+    if admin is None:
+        st.warning("Set SUPABASE_SERVICE_ROLE_KEY to enable bulk enrollment.")
+        return
+
+    try:
+        roster = st.file_uploader("Roster (CSV with an 'email' column and optional 'cohort' column)", type=['csv'])
+        default_cohort = st.text_input("Cohort for rows without one", key="enroll_cohort")
+
+        if st.button("Enroll Learners") and roster is not None:
+            parsed = parse_roster(roster.getvalue(), default_cohort.strip())
+            if parsed['invalid_lines']:
+                st.warning(f"Skipped {len(parsed['invalid_lines'])} invalid row(s): lines {parsed['invalid_lines'][:20]}")
+
+            if parsed['learners']:
+                progress_bar = st.progress(0.0)
+                results = enroll_learners(supabase, admin, parsed['learners'], progress_bar.progress)
+
+                created = sum(1 for r in results if r['status'] == CREATED)
+                existing = sum(1 for r in results if r['status'] == EXISTING)
+                failed = [r for r in results if r['status'] == FAILED or not r.get('user_id')]
+                st.success(f"✅ {created} invited, {existing} already registered, {len(failed)} failed")
+                if failed:
+                    st.dataframe([{"Email": r['email'], "Error": r.get('error', 'User not found')} for r in failed],
+                                 use_container_width=True)
+
+        st.subheader("Cohorts")
+        summary = get_cohort_summary(supabase)
+        if summary:
+            st.dataframe([{"Cohort": cohort, "Learners": count} for cohort, count in sorted(summary.items())],
+                         use_container_width=True)
+            cohort = st.selectbox("View cohort", sorted(summary))
+            # One page per rerun; the panel sits in the sidebar and reruns with every quiz interaction
+            pages = max(1, -(-summary[cohort] // config.COHORT_MEMBERS_PAGE_SIZE))
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                                   key=f"cohort_page_{cohort}")
+            st.dataframe(get_cohort_members_page(supabase, cohort, int(page)), use_container_width=True)
+    except Exception as e:
+        st.error(f"Error enrolling learners: {e}")
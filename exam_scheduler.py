@@ -0,0 +1,264 @@
+"""
+Scheduled cohort exams
+Exam events open for an enrolled cohort during a start window. Before the
+window opens the scheduler pre-warms the exam bundle and question cache and
+bulk-creates attempt records; learners' start times can be staggered by a few
+seconds so a large cohort does not hit the backend in the same instant.
+
+Exam times are timestamptz columns and are handled as UTC-aware datetimes;
+values stored without an offset are read as UTC.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+from question_bundles import list_bundles, load_bundle
+from shared_cache import load_questions
+from pagination import iter_pages
+
+SCHEDULED = "scheduled"
+STARTED = "started"
+SUBMITTED = "submitted"
+
+
+logger = logging.getLogger(__name__)
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def parse_time(value: str) -> datetime:
+    """Parse a stored timestamp as a UTC-aware datetime"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def personal_start_time(event: Dict[str, Any], user_id: str) -> datetime:
+    """Deterministic per-learner start time within the event's stagger spread"""
+    stagger = event.get('stagger_seconds') or 0
+    digest = hashlib.sha256(f"{event['id']}:{user_id}".encode()).digest()
+    offset = int.from_bytes(digest[:4], 'little') % (stagger + 1)
+    return parse_time(event['starts_at']) + timedelta(seconds=offset)
+
+
+def window_end(event: Dict[str, Any]) -> datetime:
+    return parse_time(event['starts_at']) + timedelta(minutes=event['window_minutes'])
+
+
+def create_exam_event(supabase: Client, event: Dict[str, Any]) -> bool:
+    """Create a scheduled exam event"""
+    try:
+        response = supabase.table(config.TABLES['exam_events']).insert(event).execute()
+        return bool(response.data)
+    except Exception as e:
+        st.error(f"Error scheduling exam: {e}")
+        return False
+
+
+def fetch_upcoming_events(supabase: Client, now: datetime) -> List[Dict[str, Any]]:
+    """Get exam events whose start window is open now or opens within the pre-warm lead"""
+    response = supabase.table(config.TABLES['exam_events']).select('*') \
+        .lte('starts_at', (now + timedelta(minutes=config.EXAM_PREWARM_LEAD_MINUTES)).isoformat()) \
+        .gte('starts_at', (now - timedelta(minutes=config.EXAM_MAX_WINDOW_MINUTES)).isoformat()) \
+        .order('starts_at') \
+        .execute()
+    return [event for event in response.data if window_end(event) > now]
+
+
+def get_user_cohorts(supabase: Client, user_id: str) -> Optional[List[str]]:
+    """Get the cohorts the user belongs to; None if they could not be read"""
+    try:
+        memberships = supabase.table(config.TABLES['cohort_members']).select('cohort').eq('user_id', user_id).execute()
+        return [m['cohort'] for m in memberships.data]
+    except Exception as e:
+        st.error(f"Error fetching your cohorts: {e}")
+        return None
+
+
+def get_user_exam_events(supabase: Client, cohorts: List[str]) -> List[Dict[str, Any]]:
+    """Get exam events open now or soon for some cohorts, from the scheduler's cached poll"""
+    if not cohorts:
+        return []
+    now = utc_now()
+    return [event for event in get_exam_scheduler(supabase).upcoming
+            if event['cohort'] in cohorts and window_end(event) > now]
+
+
+def get_exam_attempts(supabase: Client, user_id: str, event_ids: List[Any]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Map event ID to the learner's attempt record for some events; None if they could not be read"""
+    try:
+        response = supabase.table(config.TABLES['exam_attempts']).select('event_id, status, started_at') \
+            .eq('user_id', user_id) \
+            .in_('event_id', event_ids) \
+            .execute()
+        return {str(attempt['event_id']): attempt for attempt in response.data}
+    except Exception as e:
+        st.error(f"Error fetching exam attempts: {e}")
+        return None
+
+
+def mark_exam_started(supabase: Client, event: Dict[str, Any], user_id: str, started_at: datetime):
+    """Record that the learner started their exam attempt; started and submitted attempts are left as they are"""
+    try:
+        table = config.TABLES['exam_attempts']
+        attempt = {"status": STARTED, "started_at": started_at.isoformat()}
+        response = supabase.table(table).update(attempt) \
+            .eq('event_id', event['id']) \
+            .eq('user_id', user_id) \
+            .eq('status', SCHEDULED) \
+            .execute()
+        if not response.data:
+            # Learners enrolled after the attempts were pre-created have no record yet
+            supabase.table(table).upsert(dict(attempt, event_id=event['id'], user_id=user_id),
+                                         on_conflict='event_id,user_id', ignore_duplicates=True).execute()
+    except Exception as e:
+        st.error(f"Error recording exam start: {e}")
+
+
+def mark_exam_submitted(supabase: Client, event_id: Any, user_id: str):
+    """Record that the learner has submitted their exam attempt, so it cannot be taken again"""
+    try:
+        supabase.table(config.TABLES['exam_attempts']).update({
+            "status": SUBMITTED,
+            "submitted_at": utc_now().isoformat()
+        }).eq('event_id', event_id).eq('user_id', user_id).execute()
+    except Exception as e:
+        st.error(f"Error recording exam submission: {e}")
+
+
+def prewarm_exam(supabase: Client, event: Dict[str, Any]):
+    """Warm this worker's caches for an upcoming exam"""
+    # Map the bundle and decode it once so its pages are resident
+    load_bundle(event['bundle_id']).questions()
+    # Make sure the shared question cache is built before learners arrive
+    load_questions(supabase)
+
+
+def precreate_attempts(supabase: Client, event: Dict[str, Any]):
+    """Bulk-create one scheduled attempt per enrolled learner (idempotent, so safe to retry)"""
+    pages = iter_pages(lambda: supabase.table(config.TABLES['cohort_members']).select('user_id')
+                       .eq('cohort', event['cohort']).order('user_id'))
+    batch_size = config.EXAM_ATTEMPT_INSERT_BATCH
+    for members in pages:
+        attempts = [{
+            "event_id": event['id'],
+            "user_id": member['user_id'],
+            "status": SCHEDULED,
+            "scheduled_start": personal_start_time(event, member['user_id']).isoformat()
+        } for member in members]
+
+        for i in range(0, len(attempts), batch_size):
+            supabase.table(config.TABLES['exam_attempts']) \
+                .upsert(attempts[i:i + batch_size], on_conflict='event_id,user_id', ignore_duplicates=True) \
+                .execute()
+
+
+class ExamScheduler:
+    """Background thread that prepares exams shortly before their window opens"""
+
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+        self.warmed = set()
+        # Events from the last poll; learners' exam lists are served from here, not the database
+        self.upcoming: List[Dict[str, Any]] = []
+        self.thread = threading.Thread(target=self._run, name="exam-scheduler", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Exam scheduler error")
+            time.sleep(config.EXAM_SCHEDULER_POLL_SECONDS)
+
+    def tick(self):
+        now = utc_now()
+        events = fetch_upcoming_events(self.supabase, now)
+        self.upcoming = events
+
+        for event in events:
+            try:
+                self.prepare(event, now)
+            except Exception:
+                logger.exception("Error preparing exam %s", event['id'])
+
+    def prepare(self, event: Dict[str, Any], now: datetime):
+        # Every worker warms its own mappings
+        if event['id'] not in self.warmed:
+            prewarm_exam(self.supabase, event)
+            self.warmed.add(event['id'])
+
+        # Only the worker holding the claim pre-creates attempts; a claim left by a
+        # failed or crashed worker expires, and prepared_at is set only on success
+        if not event.get('prepared_at'):
+            lease_expired = (now - timedelta(seconds=config.EXAM_PREPARE_LEASE_SECONDS)).isoformat()
+            claim = self.supabase.table(config.TABLES['exam_events']) \
+                .update({"prepare_claimed_at": now.isoformat()}) \
+                .eq('id', event['id']) \
+                .is_('prepared_at', 'null') \
+                .or_(f'prepare_claimed_at.is.null,prepare_claimed_at.lt."{lease_expired}"') \
+                .execute()
+            if claim.data:
+                precreate_attempts(self.supabase, event)
+                self.supabase.table(config.TABLES['exam_events']) \
+                    .update({"prepared_at": utc_now().isoformat()}) \
+                    .eq('id', event['id']) \
+                    .execute()
+
+
+@st.cache_resource
+def get_exam_scheduler(_supabase: Client) -> ExamScheduler:
+    """Start the process-wide exam scheduler"""
+    return ExamScheduler(_supabase)
+
+
+def render_exam_scheduling(supabase: Client):
+    """Admin interface to schedule cohort exams"""
+    st.subheader("🗓️ Scheduled Exams")
+
+    bundles = list_bundles()
+    if not bundles:
+        st.info("Compile an exam bundle first.")
+        return
+
+    with st.form("schedule_exam_form"):
+        name = st.text_input("Exam name")
+        bundle_labels = {f"{b['name']} (v{b['version']}, {b['question_count']} questions)": b['bundle_id'] for b in bundles}
+        bundle = st.selectbox("Bundle", list(bundle_labels.keys()))
+        cohort = st.text_input("Cohort")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input("Start date")
+            duration = st.number_input("Duration (minutes)", min_value=1, value=config.DEFAULT_QUIZ_TIME_MINUTES)
+            stagger = st.number_input("Stagger start by up to (seconds)", min_value=0, value=0)
+        with col2:
+            start_time = st.time_input("Start time")
+            window = st.number_input("Start window (minutes)", min_value=1, max_value=config.EXAM_MAX_WINDOW_MINUTES, value=15)
+
+        if st.form_submit_button("Schedule Exam"):
+            if not name.strip() or not cohort.strip():
+                st.error("❌ Exam name and cohort are required")
+            elif create_exam_event(supabase, {
+                "name": name.strip(),
+                "bundle_id": bundle_labels[bundle],
+                "cohort": cohort.strip(),
+                # Entered in the server's local time
+                "starts_at": datetime.combine(start_date, start_time).astimezone(timezone.utc).isoformat(),
+                "duration_minutes": int(duration),
+                "window_minutes": int(window),
+                "stagger_seconds": int(stagger)
+            }):
+                st.success("✅ Exam scheduled successfully!")
@@ -0,0 +1,217 @@
+"""
+Item analysis for quiz questions
+Computes difficulty (p-values), point-biserial discrimination and per-option
+selection rates from the answers stored in quiz_results
+"""
+
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from supabase import Client
+
+from config import config
+from shared_cache import load_questions
+from pagination import IdWatermark
+
+OPTIONS = ['a', 'b', 'c', 'd']
+OPTION_CODES = {option: code for code, option in enumerate(OPTIONS)}
+
+
+class ItemAnalysis:
+    """
+    Incrementally updated item statistics.
+
+    Responses are accumulated as additive sufficient statistics per item
+    (counts, sums and cross products of correctness and rest score), so new
+    quiz results are folded in without revisiting older ones. Each batch of
+    attempts is processed as flat (attempt, item, option) arrays with
+    np.bincount, never with per-row Python arithmetic.
+    """
+
+    STAT_FIELDS = ('n', 'sx', 'sr', 'sxr', 'srr')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset({})
+
+    def key_changed(self, answer_key: Dict[str, int]) -> bool:
+        """Whether any question already tracked has a different correct answer"""
+        return any(self.answer_key.get(question_id, code) != code for question_id, code in answer_key.items())
+
+    def add_questions(self, answer_key: Dict[str, int]):
+        """Track new questions; results already folded in cannot have answered them"""
+        for question_id, code in answer_key.items():
+            self.answer_key.setdefault(question_id, code)
+
+    def reset(self, answer_key: Dict[str, int]):
+        """Clear all statistics and start over with the given answer key"""
+        self.answer_key = dict(answer_key)
+        self.columns: Dict[str, int] = {}
+        self.keys = np.zeros(0, dtype=np.int8)
+        self.stats = {field: np.zeros(0) for field in self.STAT_FIELDS}
+        self.option_counts = np.zeros((0, len(OPTIONS)))
+        self.watermark = IdWatermark()
+        self.attempts = 0
+
+    def _column(self, question_id: str) -> int:
+        column = self.columns.get(question_id)
+        if column is None:
+            column = self.columns[question_id] = len(self.columns)
+        return column
+
+    def _grow(self):
+        size = len(self.columns)
+        extra = size - len(self.keys)
+        if extra <= 0:
+            return
+        self.keys = np.concatenate([self.keys, np.full(extra, -1, dtype=np.int8)])
+        for question_id, column in self.columns.items():
+            if column >= size - extra:
+                self.keys[column] = self.answer_key.get(question_id, -1)
+        for field in self.STAT_FIELDS:
+            self.stats[field] = np.concatenate([self.stats[field], np.zeros(extra)])
+        self.option_counts = np.vstack([self.option_counts, np.zeros((extra, len(OPTIONS)))])
+
+    def add_results(self, results: List[Dict[str, Any]]):
+        """Fold a batch of quiz_results rows (with 'answers') into the statistics"""
+        rows, cols, codes = [], [], []
+        for row, result in enumerate(results):
+            for question_id, answer in (result.get('answers') or {}).items():
+                code = OPTION_CODES.get(answer)
+                if code is not None and question_id in self.answer_key:
+                    rows.append(row)
+                    cols.append(self._column(question_id))
+                    codes.append(code)
+        self.attempts += len(results)
+        if not rows:
+            return
+
+        self._grow()
+        size = len(self.columns)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        codes = np.asarray(codes, dtype=np.int64)
+
+        correct = (codes == self.keys[cols]).astype(np.float64)
+        totals = np.bincount(rows, weights=correct, minlength=len(results))
+        rest = totals[rows] - correct
+
+        self.stats['n'] += np.bincount(cols, minlength=size)
+        self.stats['sx'] += np.bincount(cols, weights=correct, minlength=size)
+        self.stats['sr'] += np.bincount(cols, weights=rest, minlength=size)
+        self.stats['sxr'] += np.bincount(cols, weights=correct * rest, minlength=size)
+        self.stats['srr'] += np.bincount(cols, weights=rest * rest, minlength=size)
+        self.option_counts += np.bincount(
+            cols * len(OPTIONS) + codes, minlength=size * len(OPTIONS)
+        ).reshape(size, len(OPTIONS))
+
+    def report(self) -> pd.DataFrame:
+        """Build the per-item report from the accumulated statistics"""
+        n = self.stats['n']
+        sx, sr, sxr, srr = self.stats['sx'], self.stats['sr'], self.stats['sxr'], self.stats['srr']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_values = sx / n
+            denominator = np.sqrt((n * sx - sx ** 2) * (n * srr - sr ** 2))
+            discrimination = np.where(denominator > 0, (n * sxr - sx * sr) / denominator, np.nan)
+            option_rates = self.option_counts / n[:, None]
+
+        question_ids = sorted(self.columns, key=self.columns.get)
+        report = pd.DataFrame({
+            'question_id': question_ids,
+            'responses': n.astype(int),
+            'p_value': p_values,
+            'discrimination': discrimination
+        })
+        for code, option in enumerate(OPTIONS):
+            report[f'rate_{option}'] = option_rates[:, code]
+        return report
+
+
+@st.cache_resource
+def get_item_analysis() -> ItemAnalysis:
+    """Get the process-wide item analysis state"""
+    return ItemAnalysis()
+
+
+def refresh_item_analysis(supabase: Client, questions: List[Dict[str, Any]]) -> ItemAnalysis:
+    """Fold quiz results completed since the last refresh into the item analysis"""
+    analysis = get_item_analysis()
+    answer_key = {str(q['id']): OPTION_CODES.get(q['correct_answer'], -1) for q in questions}
+    page_size = config.ITEM_ANALYSIS_PAGE_SIZE
+
+    with analysis.lock:
+        # An edited key invalidates every accumulated statistic; new questions just join
+        if analysis.key_changed(answer_key):
+            analysis.reset(answer_key)
+        else:
+            analysis.add_questions(answer_key)
+
+        # Results are read by id; completed_at is client-set and not unique
+        for batch in analysis.watermark.pages(lambda: supabase.table('quiz_results').select('id, answers'), page_size):
+            analysis.add_results(batch)
+
+    return analysis
+
+
+@st.cache_data(ttl=config.ADMIN_REPORT_CACHE_SECONDS, show_spinner=False)
+def build_item_report(_supabase: Client) -> Tuple[Optional[pd.DataFrame], int]:
+    """The flagged item report and attempt count (None without questions), cached across admin reruns"""
+    questions = load_questions(_supabase)
+    if not questions:
+        return None, 0
+
+    analysis = refresh_item_analysis(_supabase, questions)
+    report = analysis.report()
+    if report.empty:
+        return report, analysis.attempts
+
+    details = pd.DataFrame([{
+        'question_id': str(q['id']),
+        'Question': q['question'][:80] + '...' if len(q['question']) > 80 else q['question'],
+        'Category': q['category'],
+        'Correct Answer': q['correct_answer'].upper()
+    } for q in questions])
+    report = details.merge(report, on='question_id')
+
+    # Flag items that are likely too easy, too hard, broken or misleading
+    flags = []
+    for _, row in report.iterrows():
+        item_flags = []
+        if row['p_value'] >= config.ITEM_EASY_THRESHOLD:
+            item_flags.append("too easy")
+        if row['p_value'] <= config.ITEM_HARD_THRESHOLD:
+            item_flags.append("too hard")
+        if not np.isnan(row['discrimination']) and row['discrimination'] < config.ITEM_MIN_DISCRIMINATION:
+            item_flags.append("low discrimination")
+        key_rate = row[f"rate_{row['Correct Answer'].lower()}"]
+        if any(row[f'rate_{option}'] > key_rate for option in OPTIONS):
+            item_flags.append("distractor beats key")
+        flags.append(", ".join(item_flags))
+    report['Flags'] = flags
+    return report, analysis.attempts
+
+
+def render_item_analysis(supabase: Client):
+    """Display the item analysis report"""
+    st.subheader("📈 Item Analysis")
+
+    try:
+        if st.button("Refresh", key="refresh_item_analysis"):
+            build_item_report.clear()
+        report, attempts = build_item_report(supabase)
+        if report is None:
+            st.warning("No questions found in the database.")
+            return
+        if report.empty:
+            st.info("No quiz results to analyse yet.")
+            return
+
+        st.caption(f"Based on {attempts} quiz attempts")
+        st.dataframe(report.drop(columns=['question_id']), use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Error running item analysis: {e}")
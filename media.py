@@ -0,0 +1,275 @@
+"""
+Image attachments for questions and options
+Uploads are resized and re-encoded once into thumbnail and display variants.
+Variants live in a storage bucket (or a local directory) and are served through
+an LRU disk cache shared by the node's workers, so each node downloads an image
+at most once while it stays cached.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from typing import List, Dict, Any, Optional
+
+import streamlit as st
+from PIL import Image
+from supabase import Client
+
+from config import config
+from shared_cache import load_questions, rebuild_lock
+
+# Variant name -> longest side in pixels
+VARIANTS = {
+    "thumb": 240,
+    "display": 1000
+}
+TARGETS = ['question', 'a', 'b', 'c', 'd']
+
+
+def render_variants(data: bytes) -> Dict[str, bytes]:
+    """Decode an upload once and re-encode it into every variant"""
+    image = Image.open(io.BytesIO(data))
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    variants = {}
+    for name, size in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, format='WEBP', quality=config.MEDIA_WEBP_QUALITY, method=4)
+        variants[name] = output.getvalue()
+    return variants
+
+
+class LocalMediaStorage:
+    """Stores media variants in a local directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, path: str, data: bytes):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(data)
+
+    def get(self, path: str) -> bytes:
+        with open(os.path.join(self.root, path), 'rb') as f:
+            return f.read()
+
+
+class SupabaseMediaStorage:
+    """Stores media variants in a Supabase storage bucket"""
+
+    def __init__(self, supabase: Client, bucket: str):
+        self.bucket = supabase.storage.from_(bucket)
+
+    def put(self, path: str, data: bytes):
+        # storage3 reads the x-upsert header; re-uploading shared content must overwrite, not fail
+        self.bucket.upload(path, data, {"content-type": "image/webp", "x-upsert": "true"})
+
+    def get(self, path: str) -> bytes:
+        return self.bucket.download(path)
+
+
+class DiskLRUCache:
+    """
+    Size-bounded disk cache shared by every worker on the node.
+
+    The directory is the index: a hit reads the file and bumps its mtime, so
+    files written by any worker are hits for all of them. Each worker keeps a
+    running estimate of the directory's size from its last scan plus its own
+    writes; only when that crosses the bound is the directory scanned under a
+    cross-process lock and the least recently used files evicted down to a low
+    water mark. Workers' writes between scans can overshoot the bound by up to
+    the headroom below it each.
+    """
+
+    LOW_WATER_FRACTION = 0.9
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.low_water_bytes = int(max_bytes * self.LOW_WATER_FRACTION)
+        # Unknown until the first scan, which the first write triggers
+        self.estimated_bytes: Optional[int] = None
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = os.path.join(self.root, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = os.path.join(self.root, key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            if self.estimated_bytes is not None:
+                self.estimated_bytes += len(data)
+            due = self.estimated_bytes is None or self.estimated_bytes > self.max_bytes
+        if due:
+            self.evict()
+
+    def evict(self):
+        with rebuild_lock(os.path.join(self.root, ".evict")):
+            files = []
+            for entry in os.scandir(self.root):
+                if entry.is_file() and not entry.name.startswith('.') and not entry.name.endswith('.tmp'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in files)
+            if total > self.max_bytes:
+                files.sort()
+                # Always keep the newest file, even if it alone exceeds the bound
+                for _, size, path in files[:-1]:
+                    if total <= self.low_water_bytes:
+                        break
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+
+        with self.lock:
+            self.estimated_bytes = total
+
+
+@st.cache_resource
+def get_media_storage(_supabase: Client):
+    """Get the configured media storage backend"""
+    if config.MEDIA_BACKEND == "local":
+        return LocalMediaStorage(config.MEDIA_LOCAL_DIR)
+    return SupabaseMediaStorage(_supabase, config.MEDIA_BUCKET)
+
+
+@st.cache_resource
+def get_media_cache() -> DiskLRUCache:
+    """Get this node's media disk cache"""
+    return DiskLRUCache(config.MEDIA_CACHE_DIR, config.MEDIA_CACHE_MAX_MB * 1024 * 1024)
+
+
+def variant_path(content_hash: str, variant: str) -> str:
+    return f"{content_hash[:2]}/{content_hash}_{variant}.webp"
+
+
+def attach_media(supabase: Client, question_id, target: str, data: bytes, filename: str) -> bool:
+    """Resize an uploaded image into variants, store them and attach them to a question"""
+    try:
+        content_hash = hashlib.sha256(data).hexdigest()
+        storage = get_media_storage(supabase)
+        # Identical uploads share their stored variants
+        for variant, variant_data in render_variants(data).items():
+            storage.put(variant_path(content_hash, variant), variant_data)
+
+        supabase.table(config.TABLES['question_media']).insert({
+            "question_id": question_id,
+            "target": target,
+            "content_hash": content_hash,
+            "filename": filename
+        }).execute()
+        return True
+    except Exception as e:
+        st.error(f"Error attaching image: {e}")
+        return False
+
+
+def get_media_for_questions(supabase: Client, question_ids: List) -> Dict[str, List[Dict[str, Any]]]:
+    """Get attachments for a set of questions in one query, keyed by question ID"""
+    if not question_ids:
+        return {}
+    try:
+        response = supabase.table(config.TABLES['question_media']).select('question_id, target, content_hash') \
+            .in_('question_id', list(question_ids)).execute()
+        media = {}
+        for item in response.data:
+            media.setdefault(str(item['question_id']), []).append(item)
+        return media
+    except Exception as e:
+        st.error(f"Error fetching question images: {e}")
+        return {}
+
+
+def get_variant(supabase: Client, content_hash: str, variant: str) -> Optional[bytes]:
+    """Get an image variant from the disk cache, downloading it once on a miss"""
+    cache = get_media_cache()
+    key = f"{content_hash}_{variant}.webp"
+    data = cache.get(key)
+    if data is None:
+        try:
+            data = get_media_storage(supabase).get(variant_path(content_hash, variant))
+        except Exception as e:
+            st.error(f"Error loading image: {e}")
+            return None
+        try:
+            cache.put(key, data)
+        except OSError:
+            pass  # Serve it uncached; a later request retries the cache write
+    return data
+
+
+def render_media(supabase: Client, items: List[Dict[str, Any]], target: str, key_prefix: str):
+    """Show thumbnails for a question or option; full-size images load only on request"""
+    for item in items:
+        if item['target'] != target:
+            continue
+        full_size_key = f"{key_prefix}_{target}_{item['content_hash'][:12]}"
+        variant = 'display' if st.session_state.get(full_size_key) else 'thumb'
+        data = get_variant(supabase, item['content_hash'], variant)
+        if data is None:
+            continue  # get_variant already reported the error; keep the quiz usable
+        st.image(data)
+        if variant == 'thumb':
+            if st.button("View full size", key=f"{full_size_key}_button"):
+                st.session_state[full_size_key] = True
+                st.rerun()
+
+
+def render_media_admin(supabase: Client):
+    """Admin interface to attach images to questions and options"""
+    st.subheader("🖼️ Question Images")
+
+    try:
+        # The shared cache holds the whole bank; a single select would stop at 1000 rows
+        questions = sorted(load_questions(supabase), key=lambda q: q['category'])
+        if not questions:
+            st.warning("No questions available.")
+            return
+
+        # Keyed by ID, since different questions can share a label
+        by_id = {str(q['id']): q for q in questions}
+        question_id = st.selectbox(
+            "Question",
+            list(by_id),
+            format_func=lambda question_id: f"{by_id[question_id]['question'][:50]}... ({by_id[question_id]['category']})",
+            key="media_question"
+        )
+        target = st.selectbox(
+            "Attach to",
+            TARGETS,
+            format_func=lambda t: "Question text" if t == 'question' else f"Option {t.upper()}",
+            key="media_target"
+        )
+        upload = st.file_uploader("Image", type=['png', 'jpg', 'jpeg', 'gif', 'webp'], key="media_upload")
+
+        if st.button("Attach Image") and upload is not None:
+            if attach_media(supabase, by_id[question_id]['id'], target, upload.getvalue(), upload.name):
+                st.success("✅ Image attached successfully!")
+
+    except Exception as e:
+        st.error(f"Error loading questions for images: {e}")
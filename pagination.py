@@ -0,0 +1,90 @@
+"""
+Paged reads from Supabase
+PostgREST returns at most a fixed number of rows per request (1000 by default),
+so reads that can exceed that page through the result with .range() on a
+stable order until an empty page comes back.
+
+Incremental readers (rows added since the last read) page by id with an
+IdWatermark instead, which does not skip rows that commit out of id order.
+"""
+
+import time
+from typing import Callable, Iterator, List, Dict, Any, Optional
+
+from config import config
+
+
+def iter_pages(build_query: Callable[[], Any], page_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yield pages of a query; `build_query` must return a fresh query ordered by a unique key"""
+    page_size = page_size or config.SUPABASE_PAGE_SIZE
+    start = 0
+    while True:
+        batch = build_query().range(start, start + page_size - 1).execute().data
+        if not batch:
+            return
+        yield batch
+        # Advance by what came back, in case the server caps pages below page_size
+        start += len(batch)
+
+
+def fetch_all(build_query: Callable[[], Any], page_size: int = None) -> List[Dict[str, Any]]:
+    """Every row of a query, fetched page by page"""
+    rows = []
+    for batch in iter_pages(build_query, page_size):
+        rows.extend(batch)
+    return rows
+
+
+class IdWatermark:
+    """
+    Reads the rows of a table that were not returned by earlier reads, by id.
+
+    Ids come from a sequence, so they are allocated in insert order but become
+    visible in commit order: a reader can see id 7 before a slower transaction
+    commits id 6. The watermark is therefore the last id up to which every id has
+    been read; ids read above it are remembered so they are returned only once,
+    and a gap below one of them is given up on once that id was read more than
+    `grace_seconds` ago (a rolled-back insert leaves a permanent gap). Rows below
+    the first row ever read are not waited for.
+    """
+
+    def __init__(self, grace_seconds: float = None):
+        self.grace_seconds = config.CHANGE_FEED_GAP_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        self.watermark: Optional[int] = None
+        self.read_above: Dict[int, float] = {}
+
+    def pages(self, build_query: Callable[[], Any], page_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield pages of unread rows; `build_query` must return a fresh query that selects `id`
+
+        A page counts as read once the caller asks for the next one, so an error
+        while handling a page leaves it to be read again.
+        """
+        page_size = page_size or config.SUPABASE_PAGE_SIZE
+        after = self.watermark
+        # Read until an empty page, since the server may cap pages below page_size
+        while True:
+            query = build_query().order('id')
+            if after is not None:
+                query = query.gt('id', after)
+            batch = query.limit(page_size).execute().data
+            if not batch:
+                break
+            after = batch[-1]['id']
+            if self.watermark is None:
+                self.watermark = batch[0]['id'] - 1
+
+            unread = [row for row in batch if row['id'] not in self.read_above]
+            if unread:
+                yield unread
+                now = time.monotonic()
+                for row in unread:
+                    self.read_above[row['id']] = now
+        self._advance()
+
+    def _advance(self):
+        now = time.monotonic()
+        for row_id in sorted(self.read_above):
+            if row_id != self.watermark + 1 and now - self.read_above[row_id] < self.grace_seconds:
+                break
+            self.watermark = row_id
+            del self.read_above[row_id]
@@ -0,0 +1,94 @@
+"""
+PDF rendering for score reports and certificates
+Kept free of Streamlit imports so it loads quickly in report worker processes.
+"""
+
+import os
+import tempfile
+from typing import Dict, Any
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+
+def render_score_report(report: Dict[str, Any], path: str):
+    """Write a score report PDF for one attempt"""
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph("Quiz Score Report", styles['Title']),
+        Paragraph(f"Learner: {escape(report['learner'])}", styles['Normal']),
+        Paragraph(f"Quiz: {escape(report['title'])}", styles['Normal']),
+        Paragraph(f"Completed: {report['completed_at'][:16].replace('T', ' ')}", styles['Normal']),
+        Paragraph(f"Score: {report['score']:.1f}%", styles['Heading2']),
+        Spacer(1, 0.5 * cm)
+    ]
+
+    rows = [["#", "Question", "Your answer", "Correct answer", "Correct?"]]
+    for i, question in enumerate(report['questions']):
+        rows.append([
+            str(i + 1),
+            Paragraph(escape(question['question']), styles['BodyText']),
+            question['user_answer'].upper(),
+            question['correct_answer'].upper(),
+            "Yes" if question['is_correct'] else "No"
+        ])
+
+    table = Table(rows, colWidths=[1 * cm, 9.5 * cm, 2.5 * cm, 2.5 * cm, 1.5 * cm], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP')
+    ]))
+    story.append(table)
+
+    SimpleDocTemplate(path, pagesize=A4, title="Quiz Score Report").build(story)
+
+
+def render_certificate(certificate: Dict[str, Any], path: str):
+    """Write a certificate of completion PDF for one attempt"""
+    width, height = landscape(A4)
+    pdf = canvas.Canvas(path, pagesize=(width, height))
+    pdf.setTitle("Certificate of Completion")
+
+    pdf.setStrokeColor(colors.darkblue)
+    pdf.setLineWidth(4)
+    pdf.rect(1.5 * cm, 1.5 * cm, width - 3 * cm, height - 3 * cm)
+
+    pdf.setFont("Helvetica-Bold", 32)
+    pdf.drawCentredString(width / 2, height - 5 * cm, "Certificate of Completion")
+    pdf.setFont("Helvetica", 16)
+    pdf.drawCentredString(width / 2, height - 7.5 * cm, "This certifies that")
+    pdf.setFont("Helvetica-Bold", 24)
+    pdf.drawCentredString(width / 2, height - 9.5 * cm, certificate['learner'])
+    pdf.setFont("Helvetica", 16)
+    pdf.drawCentredString(width / 2, height - 11.5 * cm, f"completed {certificate['title']}")
+    pdf.drawCentredString(width / 2, height - 13 * cm, f"with a score of {certificate['score']:.1f}%")
+    pdf.setFont("Helvetica", 11)
+    pdf.drawCentredString(width / 2, 3 * cm, f"Completed {certificate['completed_at'][:10]} - Attempt {certificate['attempt_id']}")
+
+    pdf.showPage()
+    pdf.save()
+
+
+RENDERERS = {
+    "report": render_score_report,
+    "certificate": render_certificate
+}
+
+
+def generate_pdf(kind: str, data: Dict[str, Any], path: str) -> str:
+    """Render a document to `path` atomically (runs in a worker process)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".pdf.tmp")
+    os.close(fd)
+    try:
+        RENDERERS[kind](data, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return path
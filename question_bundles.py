@@ -0,0 +1,319 @@
+"""
+Precompiled question bundles for exam delivery
+A bundle is a fixed, versioned set of questions compiled into a compact binary
+file that is memory-mapped at load, so exams read no question content from the
+database and are isolated from edits made while they run. Compiled bundles are
+also uploaded to a storage bucket, and a node that does not have a bundle yet
+downloads it on first use. Each bundle's metadata is also stored as a small
+JSON file next to it, so bundles can be listed without downloading them.
+
+File layout (little endian):
+    header      magic (8s), format version (H), question count (I), metadata length (I)
+    metadata    JSON: bundle id, name, version, category, created_at, id type
+    records     count x len(FIELDS) pairs of (offset, length) as uint32 into the string blob
+    strings     UTF-8 text of every field
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from datetime import datetime
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Sequence
+
+import streamlit as st
+from supabase import create_client
+
+from config import config
+from shared_cache import load_questions
+
+HEADER = struct.Struct("<8sHII")
+MAGIC = b"QZBNDL01"
+FORMAT_VERSION = 1
+FIELDS = ('id', 'question', 'option_a', 'option_b', 'option_c', 'option_d',
+          'correct_answer', 'explanation', 'category')
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionBundle:
+    """Read-only, memory-mapped question bundle"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, self.count, metadata_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} question bundle")
+
+        metadata_start = HEADER.size
+        self.metadata = json.loads(self.map[metadata_start:metadata_start + metadata_length])
+        self.records_start = metadata_start + metadata_length
+        self.strings_start = self.records_start + self.count * len(FIELDS) * 8
+        self.records = memoryview(self.map)[self.records_start:self.strings_start].cast('I')
+
+    @property
+    def bundle_id(self) -> str:
+        return self.metadata['bundle_id']
+
+    def __len__(self) -> int:
+        return self.count
+
+    def question(self, index: int, fields: Sequence[str] = FIELDS) -> MappingProxyType:
+        """Decode one question (or some of its fields) as an immutable mapping"""
+        base = index * len(FIELDS) * 2
+        question = {}
+        for field in fields:
+            field_index = FIELDS.index(field)
+            offset = self.records[base + field_index * 2]
+            length = self.records[base + field_index * 2 + 1]
+            start = self.strings_start + offset
+            question[field] = self.map[start:start + length].decode('utf-8')
+        if 'id' in question and self.metadata.get('id_type') == 'int':
+            question['id'] = int(question['id'])
+        return MappingProxyType(question)
+
+    def questions(self, fields: Sequence[str] = FIELDS) -> List[MappingProxyType]:
+        """Decode every question (or some of its fields) in bundle order"""
+        return [self.question(i, fields) for i in range(self.count)]
+
+
+def encode_bundle(questions: List[Dict[str, Any]], metadata: Dict[str, Any]) -> bytes:
+    """Encode questions and metadata into the bundle binary format"""
+    records = []
+    strings = bytearray()
+    for question in questions:
+        for field in FIELDS:
+            value = question.get(field)
+            data = ('' if value is None else str(value)).encode('utf-8')
+            records.extend((len(strings), len(data)))
+            strings.extend(data)
+
+    metadata_bytes = json.dumps(metadata, sort_keys=True).encode('utf-8')
+    return (
+        HEADER.pack(MAGIC, FORMAT_VERSION, len(questions), len(metadata_bytes))
+        + metadata_bytes
+        + struct.pack(f"<{len(records)}I", *records)
+        + bytes(strings)
+    )
+
+
+def bundle_path(bundle_id: str) -> str:
+    return os.path.join(config.BUNDLE_DIR, f"{bundle_id}.qzb")
+
+
+def metadata_path(bundle_id: str) -> str:
+    return os.path.join(config.BUNDLE_DIR, f"{bundle_id}.json")
+
+
+def read_bundle_metadata(path: str) -> Dict[str, Any]:
+    """Read a bundle file's metadata from its header, without mapping the file"""
+    with open(path, 'rb') as f:
+        magic, format_version, _, metadata_length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} question bundle")
+        return json.loads(f.read(metadata_length))
+
+
+@st.cache_resource
+def get_bundle_bucket():
+    """Storage bucket shared by every node, or None when bundles stay on this node"""
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    if config.BUNDLE_BACKEND != "supabase" or not url or not key:
+        return None
+    return create_client(url, key).storage.from_(config.BUNDLE_BUCKET)
+
+
+def write_node_file(path: str, data: bytes):
+    """Atomically place a file in this node's bundle directory"""
+    os.makedirs(config.BUNDLE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=config.BUNDLE_DIR, prefix=".bundle-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_bundle_file(bundle_id: str, data: bytes):
+    """Atomically place a bundle file in this node's bundle directory"""
+    write_node_file(bundle_path(bundle_id), data)
+
+
+def encode_metadata(metadata: Dict[str, Any]) -> bytes:
+    return json.dumps(metadata, sort_keys=True).encode('utf-8')
+
+
+def fetch_bundle(bundle_id: str) -> bool:
+    """Download a bundle compiled on another node; False if there is nowhere to fetch it from"""
+    bucket = get_bundle_bucket()
+    if bucket is None:
+        return False
+    write_bundle_file(bundle_id, bucket.download(f"{bundle_id}.qzb"))
+    return True
+
+
+def list_bucket_names(bucket) -> List[str]:
+    """Every object name in the shared bucket (the storage API lists 100 objects per call by default)"""
+    names, offset = [], 0
+    page_size = config.SUPABASE_PAGE_SIZE
+    while True:
+        items = bucket.list(None, {"limit": page_size, "offset": offset, "sortBy": {"column": "name", "order": "asc"}})
+        names.extend(item['name'] for item in items if item.get('name'))
+        if len(items) < page_size:
+            return names
+        offset += len(items)
+
+
+def get_bundle_metadata(bundle_id: str, bucket, in_bucket: bool) -> Dict[str, Any]:
+    """Get a bundle's metadata, caching it on this node; only the small metadata file is downloaded"""
+    path = metadata_path(bundle_id)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return json.loads(f.read())
+
+    if os.path.exists(bundle_path(bundle_id)):
+        metadata = read_bundle_metadata(bundle_path(bundle_id))
+    elif in_bucket:
+        metadata = json.loads(bucket.download(f"{bundle_id}.json"))
+    else:
+        # Compiled before metadata files existed: fetch it once and publish its metadata
+        fetch_bundle(bundle_id)
+        metadata = read_bundle_metadata(bundle_path(bundle_id))
+        bucket.upload(f"{bundle_id}.json", encode_metadata(metadata),
+                      {"content-type": "application/json", "x-upsert": "true"})
+
+    write_node_file(path, encode_metadata(metadata))
+    return metadata
+
+
+@st.cache_data(ttl=config.BUNDLE_LIST_CACHE_SECONDS, show_spinner=False)
+def list_bundles() -> List[Dict[str, Any]]:
+    """List the metadata of every compiled bundle, newest first (cached; compiling clears it)"""
+    bundle_ids, with_metadata = set(), set()
+    bucket = get_bundle_bucket()
+    if bucket is not None:
+        # Includes bundles compiled on other nodes
+        names = list_bucket_names(bucket)
+        bundle_ids.update(name[:-4] for name in names if name.endswith('.qzb'))
+        with_metadata.update(name[:-5] for name in names if name.endswith('.json'))
+
+    if os.path.isdir(config.BUNDLE_DIR):
+        bundle_ids.update(filename[:-4] for filename in os.listdir(config.BUNDLE_DIR) if filename.endswith('.qzb'))
+
+    bundles = []
+    for bundle_id in bundle_ids:
+        try:
+            bundles.append(get_bundle_metadata(bundle_id, bucket, bundle_id in with_metadata))
+        except Exception:
+            # One unreadable bundle should not hide the others
+            logger.exception("Error reading metadata of bundle %s", bundle_id)
+    return sorted(bundles, key=lambda b: b['created_at'], reverse=True)
+
+
+def compile_bundle(questions: List[Dict[str, Any]], name: str, category: Optional[str] = None) -> str:
+    """Compile questions into a new immutable bundle and return its ID"""
+    if not questions:
+        raise ValueError("A bundle needs at least one question")
+
+    content = json.dumps([{field: q.get(field) for field in FIELDS} for q in questions], sort_keys=True)
+    bundle_id = hashlib.sha256(f"{name}\n{content}".encode('utf-8')).hexdigest()[:16]
+
+    # Identical content under the same name is the same bundle
+    if os.path.exists(bundle_path(bundle_id)):
+        return bundle_id
+
+    version = 1 + sum(1 for b in list_bundles() if b['name'] == name)
+    metadata = {
+        "bundle_id": bundle_id,
+        "name": name,
+        "version": version,
+        "category": category,
+        "question_count": len(questions),
+        "created_at": datetime.now().isoformat(),
+        "id_type": 'int' if all(isinstance(q['id'], int) for q in questions) else 'str'
+    }
+
+    data = encode_bundle(questions, metadata)
+    bucket = get_bundle_bucket()
+    if bucket is not None:
+        # Upload first so no node is told about a bundle it cannot fetch; the metadata
+        # goes first so a listed bundle always has it
+        bucket.upload(f"{bundle_id}.json", encode_metadata(metadata),
+                      {"content-type": "application/json", "x-upsert": "true"})
+        bucket.upload(f"{bundle_id}.qzb", data, {"content-type": "application/octet-stream", "x-upsert": "true"})
+    write_bundle_file(bundle_id, data)
+    write_node_file(metadata_path(bundle_id), encode_metadata(metadata))
+    list_bundles.clear()
+    return bundle_id
+
+
+@st.cache_resource
+def load_bundle(bundle_id: str) -> QuestionBundle:
+    """Load a bundle by ID, fetching it on first use on this node; each is mapped once per process"""
+    path = bundle_path(bundle_id)
+    if not os.path.exists(path) and not fetch_bundle(bundle_id):
+        raise FileNotFoundError(f"Bundle {bundle_id} is not available on this node")
+    return QuestionBundle(path)
+
+
+def render_bundle_admin(supabase):
+    """Admin interface to compile question bundles for exams"""
+    st.subheader("📦 Exam Bundles")
+
+    try:
+        # The shared cache holds the whole bank; a single select would stop at 1000 rows
+        questions = sorted(load_questions(supabase), key=lambda q: q['category'])
+        if not questions:
+            st.warning("No questions available to bundle.")
+            return
+
+        categories = sorted(set(q['category'] for q in questions))
+        source = st.radio("Bundle contents", ["Whole category", "Hand-picked questions"], key="bundle_source")
+
+        if source == "Whole category":
+            category = st.selectbox("Category", categories, key="bundle_category")
+            selected = [q for q in questions if q['category'] == category]
+        else:
+            category = None
+            # Keyed by ID, since different questions can share a label
+            by_id = {str(q['id']): q for q in questions}
+            picked = st.multiselect(
+                "Questions",
+                list(by_id),
+                format_func=lambda question_id: f"{by_id[question_id]['question'][:50]}... ({by_id[question_id]['category']})",
+                key="bundle_questions"
+            )
+            selected = [by_id[question_id] for question_id in picked]
+
+        name = st.text_input("Bundle name", value=category or "", key="bundle_name")
+
+        if st.button("Compile Bundle"):
+            if not name.strip() or not selected:
+                st.error("❌ A bundle needs a name and at least one question")
+            else:
+                bundle_id = compile_bundle(selected, name.strip(), category)
+                st.success(f"✅ Compiled bundle {bundle_id} with {len(selected)} questions")
+
+        bundles = list_bundles()
+        if bundles:
+            st.dataframe([{
+                'Bundle ID': b['bundle_id'],
+                'Name': b['name'],
+                'Version': b['version'],
+                'Questions': b['question_count'],
+                'Created': b['created_at'][:16]
+            } for b in bundles], use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Error compiling bundle: {e}")
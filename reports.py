@@ -0,0 +1,267 @@
+"""
+Downloadable score reports and certificates
+Documents are rendered in a process pool off the Streamlit script thread,
+cached on disk by attempt ID and content hash, and offered as downloads once
+ready. Cohort batches are queued to a separate pool, so a large batch never
+delays a learner's own download.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Dict, Any, Optional
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+from enrollment import get_cohort_members
+from pagination import fetch_all
+from pdf_reports import generate_pdf
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+def report_data(result: Dict[str, Any], learner: str) -> Dict[str, Any]:
+    """Build the report/certificate input for a stored quiz result"""
+    quiz_data = result['quiz_data']
+    answers = result.get('answers') or {}
+    questions = quiz_data.get('questions') or []
+    categories = sorted(set(q.get('category', '') for q in questions))
+
+    return {
+        "attempt_id": quiz_data.get('attempt_id') or str(result['id']),
+        "learner": learner,
+        "title": ", ".join(categories) or "Quiz",
+        "score": float(result['score']),
+        "completed_at": result['completed_at'],
+        "questions": [{
+            "question": q['question'],
+            "user_answer": answers.get(str(q['id']), '-'),
+            # Older results stored None for questions deleted mid-quiz
+            "correct_answer": q.get('correct_answer') or '-',
+            "is_correct": q.get('correct_answer') is not None and answers.get(str(q['id'])) == q['correct_answer']
+        } for q in questions]
+    }
+
+
+def document_key(kind: str, data: Dict[str, Any]) -> str:
+    """Cache key: the attempt ID plus a hash of everything the document shows"""
+    content_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{kind}_{data['attempt_id']}_{content_hash}"
+
+
+class ReportService:
+    """Queues PDF rendering on a process pool and tracks what is ready"""
+
+    def __init__(self, cache_dir: str, workers: int, batch_workers: int):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        # Spawned workers avoid forking the threaded Streamlit server
+        context = multiprocessing.get_context("spawn")
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self.batch_pool = ProcessPoolExecutor(max_workers=batch_workers, mp_context=context)
+        self.futures: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def request(self, kind: str, data: Dict[str, Any], batch: bool = False) -> str:
+        """Queue a document if it is neither cached nor in flight; return its key"""
+        key = document_key(kind, data)
+        with self.lock:
+            if key in self.futures or os.path.exists(self.path(key)):
+                return key
+            pool = self.batch_pool if batch else self.pool
+            future = pool.submit(generate_pdf, kind, data, self.path(key))
+            self.futures[key] = future
+            future.add_done_callback(lambda f, key=key: self._done(key, f))
+        return key
+
+    def _done(self, key: str, future: Future):
+        with self.lock:
+            # Successful renders are served from disk; keep failures so they are reported
+            if future.exception() is None:
+                self.futures.pop(key, None)
+
+    def status(self, key: str) -> str:
+        if os.path.exists(self.path(key)):
+            return READY
+        with self.lock:
+            future = self.futures.get(key)
+        if future is not None and future.done() and future.exception() is not None:
+            return FAILED
+        return PENDING
+
+    def retry(self, key: str):
+        with self.lock:
+            self.futures.pop(key, None)
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+@st.cache_resource
+def get_report_service() -> ReportService:
+    """Get the process-wide report service"""
+    return ReportService(config.REPORT_CACHE_DIR, config.REPORT_WORKERS, config.REPORT_BATCH_WORKERS)
+
+
+def get_attempt_result(supabase: Client, user_id: str, attempt_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch the stored result for one of the user's attempts"""
+    response = supabase.table('quiz_results').select('*') \
+        .eq('user_id', user_id) \
+        .eq('quiz_data->>attempt_id', attempt_id) \
+        .limit(1) \
+        .execute()
+    return response.data[0] if response.data else None
+
+
+def render_document_download(service: ReportService, kind: str, data: Dict[str, Any], label: str):
+    """Offer a document: queue it on first request, then show a download once ready"""
+    requested_key = f"requested_{kind}_{data['attempt_id']}"
+    if not st.session_state.get(requested_key):
+        if st.button(f"Prepare {label}", key=f"prepare_{requested_key}"):
+            st.session_state[requested_key] = True
+            st.rerun()
+        return
+
+    key = service.request(kind, data)
+    status = service.status(key)
+    if status == READY:
+        st.download_button(
+            f"⬇️ Download {label}",
+            data=service.read(key),
+            file_name=f"{kind}_{data['attempt_id']}.pdf",
+            mime="application/pdf",
+            key=f"download_{key}"
+        )
+    elif status == FAILED:
+        st.error(f"Could not generate the {label.lower()}.")
+        if st.button("Try again", key=f"retry_{key}"):
+            service.retry(key)
+            st.rerun()
+    else:
+        st.info(f"Your {label.lower()} is being prepared...")
+        if st.button("Check again", key=f"check_{key}"):
+            st.rerun()
+
+
+def render_attempt_downloads(supabase: Client, user, attempt_id: str):
+    """Score report and certificate downloads for the learner's finished attempt"""
+    try:
+        cache = st.session_state.setdefault('report_results', {})
+        result = cache.get(attempt_id)
+        if result is None:
+            result = get_attempt_result(supabase, user.id, attempt_id)
+            if not result:
+                # Not cached, so a result that is not visible yet is picked up on a later run
+                return
+            cache[attempt_id] = result
+
+        data = report_data(result, user.email)
+        service = get_report_service()
+
+        st.subheader("Downloads")
+        col1, col2 = st.columns(2)
+        with col1:
+            render_document_download(service, "report", data, "Score Report")
+        with col2:
+            if data['score'] >= config.CERTIFICATE_PASS_SCORE:
+                render_document_download(service, "certificate", data, "Certificate")
+    except Exception as e:
+        st.error(f"Error preparing downloads: {e}")
+
+
+def queue_cohort_documents(results: List[Dict[str, Any]], learners: Dict[str, str]) -> List[str]:
+    """Queue reports and certificates for a batch of results; return the document keys"""
+    service = get_report_service()
+    keys = []
+    for result in results:
+        data = report_data(result, learners.get(str(result['user_id']), str(result['user_id'])))
+        keys.append(service.request("report", data, batch=True))
+        if data['score'] >= config.CERTIFICATE_PASS_SCORE:
+            keys.append(service.request("certificate", data, batch=True))
+    return keys
+
+
+def build_documents_zip(service: ReportService, keys: List[str]) -> bytes:
+    """Zip a batch's ready documents; PDFs are already compressed, so they are stored as they are"""
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        for key in keys:
+            data = service.read(key)
+            if data is not None:
+                archive.writestr(f"{key}.pdf", data)
+    return output.getvalue()
+
+
+def render_batch_reports(supabase: Client):
+    """Admin interface to generate documents for a whole cohort"""
+    st.subheader("📄 Reports & Certificates")
+
+    try:
+        cohort = st.text_input("Cohort", key="report_cohort")
+        since = st.date_input("Results completed on or after", key="report_since")
+
+        if st.button("Generate for Cohort") and cohort.strip():
+            members = get_cohort_members(supabase, cohort.strip())
+            learners = {str(m['user_id']): m.get('email') or str(m['user_id']) for m in members}
+            if not learners:
+                st.warning("No learners found in this cohort.")
+                return
+
+            # Query in chunks to keep the user ID filter a reasonable size
+            user_ids = list(learners)
+            results = []
+            for i in range(0, len(user_ids), config.REPORT_QUERY_CHUNK):
+                chunk = user_ids[i:i + config.REPORT_QUERY_CHUNK]
+                # A chunk of active learners can have far more than one page of results
+                results.extend(fetch_all(lambda: supabase.table('quiz_results').select('*') \
+                    .in_('user_id', chunk) \
+                    .gte('completed_at', since.isoformat()) \
+                    .order('id')))
+            st.session_state.batch_report_keys = queue_cohort_documents(results, learners)
+            st.session_state.batch_report_cohort = cohort.strip()
+            st.session_state.pop('batch_report_zip', None)
+
+        keys = st.session_state.get('batch_report_keys')
+        if keys:
+            service = get_report_service()
+            statuses = [service.status(key) for key in keys]
+            ready, failed = statuses.count(READY), statuses.count(FAILED)
+            st.progress(ready / len(keys), text=f"{ready} of {len(keys)} documents ready")
+            if failed:
+                st.warning(f"{failed} document(s) could not be generated and are left out.")
+
+            if ready + failed < len(keys):
+                if st.button("Refresh progress"):
+                    st.rerun()
+            elif ready:
+                # Built once on request, not on every admin rerun
+                if 'batch_report_zip' not in st.session_state:
+                    if st.button("Prepare ZIP download"):
+                        st.session_state.batch_report_zip = build_documents_zip(service, keys)
+                        st.rerun()
+                else:
+                    st.download_button(
+                        "⬇️ Download all (ZIP)",
+                        data=st.session_state.batch_report_zip,
+                        file_name=f"{st.session_state.batch_report_cohort}_documents.zip",
+                        mime="application/zip",
+                        key="download_batch_reports"
+                    )
+    except Exception as e:
+        st.error(f"Error generating reports: {e}")
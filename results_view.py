@@ -0,0 +1,125 @@
+"""
+Quiz results view
+Per-question results are computed once per attempt and cached in the session,
+the summary renders first, and details are paged and filtered. The answer key
+and explanations are fetched from the server only when results are shown, and
+each explanation is revealed when a learner asks for it.
+"""
+
+from typing import List, Dict, Any, Mapping, Optional
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+from answer_key import get_answer_key, get_explanations
+
+FILTERS = ["All", "Incorrect only", "Correct only", "Unanswered"]
+
+
+def build_results(questions: List[Dict[str, Any]], answers: Dict[str, str],
+                  answer_key: Mapping[str, str], explanations: Mapping[str, str]) -> Dict[str, Any]:
+    """Compute the per-question results and score for an attempt"""
+    rows = []
+    for i, question in enumerate(questions):
+        question_id = str(question['id'])
+        user_answer_key = answers.get(question_id)
+        correct_answer_key = answer_key.get(question_id)
+        options = {
+            'a': question['option_a'],
+            'b': question['option_b'],
+            'c': question['option_c'],
+            'd': question['option_d']
+        }
+        rows.append({
+            "index": i,
+            "question_id": question_id,
+            "question": question['question'],
+            "user_answer": options.get(user_answer_key, 'No answer') if user_answer_key else 'No answer',
+            "correct_answer": options.get(correct_answer_key, 'Unknown'),
+            "explanation": explanations.get(question_id) or '',
+            "answered": user_answer_key is not None,
+            "is_correct": user_answer_key is not None and user_answer_key == correct_answer_key
+        })
+
+    correct = sum(1 for row in rows if row['is_correct'])
+    return {
+        "rows": rows,
+        "score": (correct / len(rows)) * 100 if rows else 0,
+        "correct": correct,
+        "incorrect": sum(1 for row in rows if row['answered'] and not row['is_correct']),
+        "unanswered": sum(1 for row in rows if not row['answered'])
+    }
+
+
+def get_results(supabase: Client, attempt_id: str, questions: List[Dict[str, Any]], answers: Dict[str, str],
+                bundle_id: Optional[str] = None) -> Dict[str, Any]:
+    """Get the cached results for an attempt, building them on first use"""
+    cache = st.session_state.setdefault('results_cache', {})
+    if attempt_id not in cache:
+        answer_key = get_answer_key(supabase, questions, bundle_id)
+        explanations = get_explanations(supabase, questions, bundle_id)
+        # Only the current attempt is kept
+        cache.clear()
+        cache[attempt_id] = build_results(questions, answers, answer_key, explanations)
+    return cache[attempt_id]
+
+
+def filter_rows(rows: List[Dict[str, Any]], selected_filter: str) -> List[Dict[str, Any]]:
+    if selected_filter == "Incorrect only":
+        return [row for row in rows if row['answered'] and not row['is_correct']]
+    if selected_filter == "Correct only":
+        return [row for row in rows if row['is_correct']]
+    if selected_filter == "Unanswered":
+        return [row for row in rows if not row['answered']]
+    return rows
+
+
+def render_results(supabase: Client, attempt_id: str, questions: List[Dict[str, Any]], answers: Dict[str, str],
+                   bundle_id: Optional[str] = None):
+    """Render the summary, then one filtered page of per-question details"""
+    try:
+        results = get_results(supabase, attempt_id, questions, answers, bundle_id)
+    except Exception as e:
+        st.error(f"Error loading results: {e}")
+        return
+
+    st.success(f"Quiz completed! Your score: {results['score']:.1f}%")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Correct", results['correct'])
+    with col2:
+        st.metric("Incorrect", results['incorrect'])
+    with col3:
+        st.metric("Unanswered", results['unanswered'])
+
+    st.subheader("Detailed Results")
+    selected_filter = st.radio("Show", FILTERS, horizontal=True, key=f"results_filter_{attempt_id}")
+    rows = filter_rows(results['rows'], selected_filter)
+    if not rows:
+        st.info("No questions match this filter.")
+        return
+
+    page_size = config.RESULTS_PAGE_SIZE
+    page_count = (len(rows) + page_size - 1) // page_size
+    page = 1
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key=f"results_page_{attempt_id}")
+
+    shown_explanations = st.session_state.setdefault('shown_explanations', set())
+    for row in rows[(page - 1) * page_size:page * page_size]:
+        with st.expander(f"Question {row['index'] + 1}: {row['question']}"):
+            st.write(f"**Your answer:** {row['user_answer']}")
+            st.write(f"**Correct answer:** {row['correct_answer']}")
+
+            if row['is_correct']:
+                st.success("✅ Correct!")
+            else:
+                st.error("❌ Incorrect!")
+
+            explanation_key = (attempt_id, row['question_id'])
+            if explanation_key in shown_explanations:
+                st.write(f"**Explanation:** {row['explanation']}")
+            elif st.button("Show explanation", key=f"explain_{attempt_id}_{row['question_id']}"):
+                shown_explanations.add(explanation_key)
+                st.write(f"**Explanation:** {row['explanation']}")
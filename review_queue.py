@@ -0,0 +1,132 @@
+"""
+Spaced-repetition review queue
+Schedules previously missed questions with the SM-2 algorithm so learners
+can review them when they fall due. Schedule times are timestamptz and
+written in UTC.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Mapping
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+from shared_cache import QUIZ_FIELDS
+
+# SM-2 answer quality grades (0-5 scale)
+QUALITY_CORRECT = 4
+QUALITY_INCORRECT = 1
+QUALITY_UNANSWERED = 0
+
+logger = logging.getLogger(__name__)
+
+
+def sm2_update(item: Dict[str, Any], quality: int, now: datetime = None) -> Dict[str, Any]:
+    """Apply one SM-2 review to a schedule item and return the updated item"""
+    now = now or datetime.now(timezone.utc)
+    easiness = item.get('easiness', 2.5)
+    repetitions = item.get('repetitions', 0)
+    interval_days = item.get('interval_days', 0)
+
+    if quality < 3:
+        repetitions = 0
+        interval_days = 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval_days = 1
+        elif repetitions == 2:
+            interval_days = 6
+        else:
+            interval_days = round(interval_days * easiness)
+
+    easiness = max(1.3, easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    updated = dict(item)
+    updated.update({
+        "easiness": round(easiness, 4),
+        "repetitions": repetitions,
+        "interval_days": interval_days,
+        "due_at": (now + timedelta(days=interval_days)).isoformat(),
+        "last_reviewed_at": now.isoformat()
+    })
+    return updated
+
+
+def answer_quality(question: Dict[str, Any], answers: Dict[str, str], answer_key: Mapping[str, str]) -> int:
+    """Grade a single answer on the SM-2 quality scale"""
+    answer = answers.get(str(question['id']))
+    if answer is None:
+        return QUALITY_UNANSWERED
+    return QUALITY_CORRECT if answer == answer_key.get(str(question['id'])) else QUALITY_INCORRECT
+
+
+def record_review_results(supabase: Client, user_id: str, questions: List[Dict[str, Any]], answers: Dict[str, str],
+                          answer_key: Mapping[str, str]):
+    """Update the user's review schedule after a quiz or review session"""
+    table = config.TABLES['review_items']
+    try:
+        question_ids = [question['id'] for question in questions]
+        response = supabase.table(table).select('*').eq('user_id', user_id).in_('question_id', question_ids).execute()
+        existing = {str(item['question_id']): item for item in response.data}
+
+        now = datetime.now(timezone.utc)
+        updates = []
+        for question in questions:
+            quality = answer_quality(question, answers, answer_key)
+            item = existing.get(str(question['id']))
+
+            # Only missed questions enter the queue; correct answers advance items already in it
+            if item is None and quality >= 3:
+                continue
+            if item is None:
+                item = {"user_id": user_id, "question_id": question['id']}
+
+            updates.append(sm2_update(item, quality, now))
+
+        if updates:
+            supabase.table(table).upsert(updates, on_conflict='user_id,question_id').execute()
+    except Exception as e:
+        st.error(f"Error updating review schedule: {e}")
+
+
+def get_due_reviews(supabase: Client, user_id: str, limit: int = None) -> List[Dict[str, Any]]:
+    """Get the questions due for review, most overdue first"""
+    limit = limit or config.REVIEW_SESSION_SIZE
+    table = config.TABLES['review_items']
+    try:
+        now = datetime.now(timezone.utc).isoformat()
+        due, orphaned = [], []
+        while len(due) < limit:
+            wanted = limit - len(due)
+            # Served by the (user_id, due_at) index
+            query = supabase.table(table).select('question_id').eq('user_id', user_id).lte('due_at', now)
+            if orphaned:
+                query = query.not_.in_('question_id', orphaned)
+            due_response = query.order('due_at').range(len(due), len(due) + wanted - 1).execute()
+            question_ids = [item['question_id'] for item in due_response.data]
+            if not question_ids:
+                break
+
+            # Quiz payload only; answers are looked up server-side when the review is scored
+            questions_response = supabase.table('questions').select(', '.join(QUIZ_FIELDS)).in_('id', question_ids).execute()
+            by_id = {question['id']: question for question in questions_response.data}
+            due.extend(by_id[question_id] for question_id in question_ids if question_id in by_id)
+
+            # Items for deleted questions would stay due forever and take up the session's slots
+            missing = [question_id for question_id in question_ids if question_id not in by_id]
+            if missing:
+                orphaned.extend(missing)
+                try:
+                    supabase.table(table).delete().eq('user_id', user_id).in_('question_id', missing).execute()
+                except Exception:
+                    # Still skipped by this read; the next read retries the cleanup
+                    logger.exception("Error removing review items for deleted questions")
+            if len(question_ids) < wanted:
+                break
+        return due
+    except Exception as e:
+        st.error(f"Error fetching review queue: {e}")
+        return []
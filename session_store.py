@@ -0,0 +1,284 @@
+"""
+External quiz session store
+Keeps each learner's quiz session (current quiz, answers, completion) outside
+the Streamlit process in a compact serialized form, with a version number for
+optimistic concurrency, so any worker can serve the learner's next request.
+
+Starting, finishing or leaving a quiz is written immediately; answer changes
+go through a debounced writer, so a burst of clicks costs one store write.
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+import streamlit as st
+
+from config import config
+from debounced_writer import DebouncedWriter
+from autosave import serialize_attempt, deserialize_attempt
+
+try:
+    import psycopg2
+    import psycopg2.pool
+except ImportError:  # Only needed for the Postgres backend
+    psycopg2 = None
+
+
+class StaleSessionError(Exception):
+    """Raised when a session was changed by another worker since it was read"""
+
+
+def encode_session(user_id: str) -> bytes:
+    """Serialize the quiz session in st.session_state to compressed JSON"""
+    if st.session_state.current_quiz:
+        record = serialize_attempt(
+            user_id,
+            st.session_state.current_quiz,
+            st.session_state.quiz_answers,
+            st.session_state.quiz_start_time
+        )
+        del record['updated_at'], record['user_id']
+    else:
+        record = {}
+    record['completed'] = bool(st.session_state.quiz_completed)
+    return zlib.compress(json.dumps(record, separators=(',', ':'), sort_keys=True).encode())
+
+
+def decode_session(blob: bytes) -> Dict[str, Any]:
+    """Turn a stored session back into session state values"""
+    record = json.loads(zlib.decompress(blob))
+    if 'quiz_data' not in record:
+        return {"current_quiz": None, "quiz_answers": {}, "quiz_start_time": None,
+                "quiz_completed": record['completed']}
+    session = deserialize_attempt(record)
+    session['quiz_completed'] = record['completed']
+    return session
+
+
+class MemorySessionStore:
+    """In-process store; sessions are only shared between reruns on one worker"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, Tuple[int, bytes]] = {}
+
+    def load(self, key: str) -> Optional[Tuple[int, bytes]]:
+        with self.lock:
+            return self.sessions.get(key)
+
+    def save(self, key: str, blob: bytes, expected_version: int) -> int:
+        with self.lock:
+            current_version = self.sessions.get(key, (0, None))[0]
+            if current_version != expected_version:
+                raise StaleSessionError(key)
+            self.sessions[key] = (current_version + 1, blob)
+            return current_version + 1
+
+
+class SQLiteSessionStore:
+    """Store shared by workers on one node through a SQLite file"""
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_sessions "
+            "(session_key TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL)"
+        )
+
+    def load(self, key: str) -> Optional[Tuple[int, bytes]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT version, data FROM quiz_sessions WHERE session_key = ?", (key,)
+            ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def save(self, key: str, blob: bytes, expected_version: int) -> int:
+        with self.lock:
+            if expected_version == 0:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO quiz_sessions (session_key, version, data) VALUES (?, 1, ?)",
+                    (key, blob)
+                )
+            else:
+                cursor = self.conn.execute(
+                    "UPDATE quiz_sessions SET data = ?, version = version + 1 WHERE session_key = ? AND version = ?",
+                    (blob, key, expected_version)
+                )
+        if cursor.rowcount != 1:
+            raise StaleSessionError(key)
+        return expected_version + 1
+
+
+class PostgresSessionStore:
+    """Store shared by every worker through a Postgres table"""
+
+    def __init__(self, dsn: str, max_connections: int):
+        if psycopg2 is None:
+            raise RuntimeError("The Postgres session store requires psycopg2 (pip install psycopg2-binary)")
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, max_connections, dsn)
+        with self._conn() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS quiz_sessions "
+                "(session_key TEXT PRIMARY KEY, version BIGINT NOT NULL, data BYTEA NOT NULL)"
+            )
+
+    @contextmanager
+    def _conn(self):
+        # Streamlit runs every script run on a new thread, so connections are pooled
+        # per process rather than per thread; each call commits or rolls back its transaction
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+    def load(self, key: str) -> Optional[Tuple[int, bytes]]:
+        with self._conn() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT version, data FROM quiz_sessions WHERE session_key = %s", (key,))
+            row = cursor.fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def save(self, key: str, blob: bytes, expected_version: int) -> int:
+        with self._conn() as conn, conn.cursor() as cursor:
+            if expected_version == 0:
+                cursor.execute(
+                    "INSERT INTO quiz_sessions (session_key, version, data) VALUES (%s, 1, %s) "
+                    "ON CONFLICT (session_key) DO NOTHING",
+                    (key, psycopg2.Binary(blob))
+                )
+            else:
+                cursor.execute(
+                    "UPDATE quiz_sessions SET data = %s, version = version + 1 WHERE session_key = %s AND version = %s",
+                    (psycopg2.Binary(blob), key, expected_version)
+                )
+            if cursor.rowcount != 1:
+                raise StaleSessionError(key)
+        return expected_version + 1
+
+
+class SessionWriter(DebouncedWriter):
+    """
+    Debounced session writer, keyed by browser session rather than by user.
+
+    Each write expects the version that session last read or wrote, so two
+    sessions of one learner (a second tab, or a reconnect) conflict even on the
+    same worker. The version each session last wrote is kept so its next write
+    can follow it before the session has seen the result.
+    """
+
+    def __init__(self, store, debounce_seconds: float, min_interval_seconds: float):
+        super().__init__(debounce_seconds, min_interval_seconds, "session-store")
+        self.store = store
+        self.versions: Dict[str, int] = {}
+        self.conflicts = set()
+
+    def version(self, session_key: str, known_version: int) -> int:
+        """The newer of the session's known version and the version it last wrote"""
+        with self.lock:
+            return max(self.versions.get(session_key, 0), known_version)
+
+    def schedule(self, session_key: str, user_id: str, blob: bytes, known_version: int):
+        """Queue a session's blob, replacing any pending blob from the same session"""
+        super().schedule(session_key, (user_id, blob, known_version))
+
+    def take_conflict(self, session_key: str) -> bool:
+        with self.lock:
+            if session_key in self.conflicts:
+                self.conflicts.discard(session_key)
+                return True
+            return False
+
+    def save(self, session_key: str, item: Tuple[str, bytes, int]):
+        user_id, blob, known_version = item
+        try:
+            version = self.store.save(user_id, blob, self.version(session_key, known_version))
+        except StaleSessionError:
+            # Another session won; its copy is loaded on this learner's next run
+            with self.lock:
+                self.conflicts.add(session_key)
+            return
+        with self.lock:
+            self.versions[session_key] = version
+
+    def forget(self, session_key: str):
+        self.versions.pop(session_key, None)
+        self.conflicts.discard(session_key)
+
+
+@st.cache_resource
+def get_session_store():
+    """Get the configured session store"""
+    if config.SESSION_STORE_BACKEND == "sqlite":
+        return SQLiteSessionStore(config.SESSION_STORE_SQLITE_PATH)
+    if config.SESSION_STORE_BACKEND == "postgres":
+        return PostgresSessionStore(config.SESSION_STORE_POSTGRES_DSN, config.SESSION_STORE_POSTGRES_MAX_CONNECTIONS)
+    return MemorySessionStore()
+
+
+@st.cache_resource
+def get_session_writer() -> SessionWriter:
+    """Get the process-wide debounced session writer"""
+    return SessionWriter(get_session_store(), config.SESSION_STORE_DEBOUNCE_SECONDS,
+                         config.SESSION_STORE_MIN_INTERVAL_SECONDS)
+
+
+def session_key() -> str:
+    """Identify this browser session to the session writer"""
+    if 'session_key' not in st.session_state:
+        st.session_state.session_key = uuid.uuid4().hex
+    return st.session_state.session_key
+
+
+def load_quiz_session(user_id: str) -> Optional[Dict[str, Any]]:
+    """Return the stored session if another session or worker has written a newer one"""
+    try:
+        writer = get_session_writer()
+        # This session's unwritten changes are newer than anything in the store
+        if writer.has_pending(session_key()):
+            return None
+
+        stored = get_session_store().load(user_id)
+        if stored is None or stored[0] <= writer.version(session_key(), st.session_state.get('session_version', 0)):
+            return None
+
+        session = decode_session(stored[1])
+        st.session_state.session_version = stored[0]
+        st.session_state.session_blob = stored[1]
+        return session
+    except Exception as e:
+        st.error(f"Error loading quiz session: {e}")
+        return None
+
+
+def save_quiz_session(user_id: str):
+    """Write the quiz session back if it changed during this run"""
+    try:
+        writer = get_session_writer()
+        blob = encode_session(user_id)
+        if blob != st.session_state.get('session_blob'):
+            writer.schedule(session_key(), user_id, blob, st.session_state.get('session_version', 0))
+            st.session_state.session_blob = blob
+
+            # Starting, finishing or leaving a quiz is written now; answer changes are coalesced
+            quiz = st.session_state.current_quiz
+            milestone = (quiz['attempt_id'] if quiz else None, bool(st.session_state.quiz_completed))
+            if milestone != st.session_state.get('session_milestone'):
+                st.session_state.session_milestone = milestone
+                writer.flush(session_key())
+
+        st.session_state.session_version = writer.version(session_key(), st.session_state.get('session_version', 0))
+        if writer.take_conflict(session_key()):
+            st.session_state.session_conflict = True
+        error = writer.take_error(session_key())
+        if error:
+            st.error(f"Error saving quiz session (will retry): {error}")
+    except Exception as e:
+        st.error(f"Error saving quiz session: {e}")
@@ -0,0 +1,272 @@
+"""
+Shared question cache for multi-worker deployments
+The question bank is published as a memory-mapped file with a versioned header,
+so every Streamlit worker on the node reads the same pages instead of keeping
+its own copy. The header version is the change feed version the file reflects;
+workers apply newer changes as deltas and replace the file atomically.
+
+Besides the full bank, each category has three slices: the answer-free quiz
+payload, its answer key and its explanations, so starting a quiz, scoring it
+and showing results each decode only what they need.
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable, Iterable
+
+import streamlit as st
+from supabase import Client
+
+from config import config
+from pagination import fetch_all
+from change_feed import get_change_log, get_changes_since, apply_changes, safe_latest_version
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process rebuild lock
+    fcntl = None
+
+# magic, change feed version, index length, payload length, payload crc32
+HEADER = struct.Struct("<8sQQQI")
+MAGIC = b"QZCACHE2"
+ALL_QUESTIONS = "__all__"
+# Fields delivered to the quiz; the answer key and explanations stay server-side
+QUIZ_FIELDS = ('id', 'question', 'option_a', 'option_b', 'option_c', 'option_d', 'category')
+ANSWER_FIELDS = ('correct_answer', 'explanation')
+
+
+def slice_name(kind: str, category: str) -> str:
+    return f"{kind}:{category}"
+
+
+def encode_bundle(questions: List[Dict[str, Any]], version: int) -> bytes:
+    """Encode questions into header + index + per-category JSON slices"""
+    by_category: Dict[str, List[Dict[str, Any]]] = {}
+    for question in questions:
+        by_category.setdefault(question['category'], []).append(question)
+
+    def encode(value) -> bytes:
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    slices = {ALL_QUESTIONS: encode(questions)}
+    for category, category_questions in by_category.items():
+        slices[slice_name('quiz', category)] = encode(
+            [{field: q.get(field) for field in QUIZ_FIELDS} for q in category_questions]
+        )
+        for field in ANSWER_FIELDS:
+            slices[slice_name(field, category)] = encode({str(q['id']): q.get(field) for q in category_questions})
+
+    index, offset = {}, 0
+    for name, data in slices.items():
+        index[name] = [offset, len(data)]
+        offset += len(data)
+
+    index_bytes = json.dumps({"categories": sorted(by_category), "slices": index}).encode()
+    payload = index_bytes + b"".join(slices.values())
+    return HEADER.pack(MAGIC, version, len(index_bytes), len(payload), zlib.crc32(payload)) + payload
+
+
+class SharedQuestionCache:
+    """Read-only view of the published cache file, re-attached when it is replaced"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.identity = None
+        self.map = None
+        self.version = None
+        self.index = None
+        self.payload_offset = 0
+        self.last_sync = 0.0
+
+    def _attach(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.identity = self.map = self.index = None
+            return False
+
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self.identity:
+            return self.map is not None
+
+        with open(self.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, index_length, payload_length, crc = HEADER.unpack_from(mapped, 0)
+        payload = memoryview(mapped)[HEADER.size:HEADER.size + payload_length]
+        valid = magic == MAGIC and len(payload) == payload_length and zlib.crc32(payload) == crc
+        payload.release()
+        if not valid:
+            mapped.close()
+            self.identity = self.map = self.index = None
+            return False
+
+        self.map = mapped
+        self.identity = identity
+        self.version = version
+        self.payload_offset = HEADER.size
+        self.index = json.loads(mapped[HEADER.size:HEADER.size + index_length])
+        self.payload_offset += index_length
+        return True
+
+    def _slice(self, name: str, default):
+        if name not in self.index['slices']:
+            return default
+        offset, length = self.index['slices'][name]
+        start = self.payload_offset + offset
+        return json.loads(self.map[start:start + length])
+
+    def current_version(self) -> Optional[int]:
+        """The change feed version of the published file without decoding it, or None on a cache miss"""
+        with self.lock:
+            return self.version if self._attach() else None
+
+    def get(self) -> Optional[List[Dict[str, Any]]]:
+        """Decode the full question bank, or None on a cache miss"""
+        with self.lock:
+            if not self._attach():
+                return None
+            return self._slice(ALL_QUESTIONS, [])
+
+    def quiz_questions(self, category: str) -> Optional[List[Dict[str, Any]]]:
+        """Decode a category's questions without answers or explanations, or None on a cache miss"""
+        with self.lock:
+            if not self._attach():
+                return None
+            return self._slice(slice_name('quiz', category), [])
+
+    def answer_field(self, field: str, categories: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Map question ID to `correct_answer` or `explanation` for some categories, or None on a cache miss"""
+        with self.lock:
+            if not self._attach():
+                return None
+            values = {}
+            for category in categories:
+                values.update(self._slice(slice_name(field, category), {}))
+            return values
+
+    def categories(self) -> Optional[List[str]]:
+        """Get the category names, or None on a cache miss"""
+        with self.lock:
+            if not self._attach():
+                return None
+            return list(self.index['categories'])
+
+    def publish(self, questions: List[Dict[str, Any]], version: int):
+        """Atomically replace the cache file with the questions as of a change feed version"""
+        data = encode_bundle(questions, version)
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".questions-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+@contextmanager
+def rebuild_lock(path: str):
+    """Cross-process lock so only one worker refetches a cold cache"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@st.cache_resource
+def get_shared_cache() -> SharedQuestionCache:
+    """Get this worker's handle on the shared question cache"""
+    os.makedirs(config.SHARED_CACHE_DIR, exist_ok=True)
+    return SharedQuestionCache(os.path.join(config.SHARED_CACHE_DIR, "questions.cache"))
+
+
+def _rebuild(supabase: Client, cache: SharedQuestionCache):
+    """Bring the cache file up to the latest change feed version (caller holds the rebuild lock)"""
+    change_log = get_change_log(supabase)
+    questions = cache.get()
+
+    if questions is None:
+        # Read the version first: changes made during the fetch are re-applied next sync.
+        # Stop below any gap, so a write still committing is not skipped
+        version = safe_latest_version(change_log)
+        questions = fetch_all(lambda: supabase.table('questions').select('*').order('id'))
+        cache.publish(questions, version)
+        return
+
+    changes = get_changes_since(supabase, cache.version)
+    if changes:
+        cache.publish(apply_changes(questions, changes), changes[-1]['version'])
+
+
+def _sync(supabase: Client, cache: SharedQuestionCache):
+    """Rebuild the cache if it is cold or behind the change feed"""
+    version = cache.current_version()
+    # Usually nothing changed: skip the lock and the decode
+    if version is not None and not get_changes_since(supabase, version):
+        return
+    with rebuild_lock(cache.path):
+        # Another worker may have synced the cache while we waited
+        _rebuild(supabase, cache)
+
+
+def sync_shared_cache(supabase: Client):
+    """Apply pending question changes to the shared cache"""
+    try:
+        cache = get_shared_cache()
+        _sync(supabase, cache)
+        cache.last_sync = time.monotonic()
+    except Exception as e:
+        st.error(f"Error syncing question cache: {e}")
+
+
+def _read(supabase: Client, read: Callable[[SharedQuestionCache], Any], default):
+    """Read from the shared cache, syncing it from the change feed when due"""
+    cache = get_shared_cache()
+    value = read(cache)
+    if value is not None and time.monotonic() - cache.last_sync < config.CHANGE_FEED_POLL_SECONDS:
+        return value
+
+    _sync(supabase, cache)
+    cache.last_sync = time.monotonic()
+
+    value = read(cache)
+    return value if value is not None else default
+
+
+def load_questions(supabase: Client) -> List[Dict[str, Any]]:
+    """Get the full question bank, including answers, from the shared cache"""
+    return _read(supabase, lambda cache: cache.get(), [])
+
+
+def load_categories(supabase: Client) -> List[str]:
+    """Get the category names from the shared cache"""
+    return _read(supabase, lambda cache: cache.categories(), [])
+
+
+def load_quiz_questions(supabase: Client, category: str) -> List[Dict[str, Any]]:
+    """Get a category's quiz payload (stem and options only) from the shared cache"""
+    return _read(supabase, lambda cache: cache.quiz_questions(category), [])
+
+
+def load_answer_field(supabase: Client, field: str, categories: Iterable[str]) -> Dict[str, Any]:
+    """Get question ID -> `correct_answer` or `explanation` for some categories from the shared cache"""
+    categories = set(categories)
+    return _read(supabase, lambda cache: cache.answer_field(field, categories), {})
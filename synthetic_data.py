@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for scale benchmarks
+Creates a reproducible question bank (N categories x M questions) and a
+realistic quiz_results history (answers, telemetry and timestamps), and writes
+it in bulk to Supabase or to a local SQLite stand-in.
+
+Learner ability and item difficulty follow a simple IRT model, wrong answers
+favour each item's more popular distractors, a small share of learners take
+most attempts, dwell time grows with difficulty, and completions follow a
+daily activity curve. The same seed and end date always produce the same
+data, whatever the number of worker processes.
+
+Usage:
+    python synthetic_data.py --categories 20 --questions 200 --users 10000 --attempts 500000
+    python synthetic_data.py --target supabase --attempts 50000
+
+Supabase question inserts reach the question change feed through the
+log_question_change trigger, so running apps pick them up without a restart.
+"""
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Tuple, Iterator
+
+import numpy as np
+
+OPTIONS = np.array(['a', 'b', 'c', 'd'])
+# What submit_quiz stores per question in quiz_data: the quiz payload (shared_cache.QUIZ_FIELDS)
+# plus the correct answer at submission time; explanations are not stored with results
+RESULT_QUESTION_FIELDS = ('id', 'question', 'option_a', 'option_b', 'option_c', 'option_d', 'category', 'correct_answer')
+# Relative activity by hour of day
+HOURLY_ACTIVITY = np.array([1, 1, 1, 1, 1, 2, 4, 6, 8, 10, 10, 9, 8, 9, 10, 10, 9, 8, 7, 7, 6, 4, 2, 1], dtype=float)
+
+
+def generate_questions(rng: np.random.Generator, categories: int, per_category: int):
+    """Question rows plus the hidden item parameters used to simulate answers"""
+    count = categories * per_category
+    correct = rng.integers(0, 4, size=count)
+    questions = []
+    for i in range(count):
+        category = f"Category {i // per_category + 1:03d}"
+        questions.append({
+            "question": f"Synthetic question {i + 1} in {category}?",
+            "option_a": f"Option A for question {i + 1}",
+            "option_b": f"Option B for question {i + 1}",
+            "option_c": f"Option C for question {i + 1}",
+            "option_d": f"Option D for question {i + 1}",
+            "correct_answer": str(OPTIONS[correct[i]]),
+            "explanation": f"Explanation for synthetic question {i + 1}.",
+            "category": category
+        })
+
+    items = {
+        "correct": correct,
+        "difficulty": rng.normal(0, 1, size=count),
+        # Popularity of each option when the answer is wrong (the key is zeroed out)
+        "distractors": rng.dirichlet(np.ones(4) * 0.8, size=count)
+    }
+    items['distractors'][np.arange(count), correct] = 0
+    items['distractors'] /= items['distractors'].sum(axis=1, keepdims=True)
+    return questions, items
+
+
+def build_context(seed: int, questions, question_ids, items, categories: int, per_category: int,
+                  users: int, end: datetime, days: int, questions_per_quiz: int) -> Dict[str, Any]:
+    """Learner population and pre-serialized fragments shared by every batch"""
+    rng = np.random.default_rng([seed, 0])
+    activity = rng.pareto(1.5, size=users) + 1  # A minority of learners take most attempts
+    return {
+        "seed": seed,
+        "items": items,
+        "categories": categories,
+        "per_category": per_category,
+        "per_quiz": min(per_category, questions_per_quiz),
+        "days": days,
+        "start": np.datetime64(end, 's') - np.timedelta64(days, 'D'),
+        "user_ids": np.array([str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(users)], dtype=object),
+        "ability": rng.normal(0, 1, size=users),
+        "activity": activity / activity.sum(),
+        # Every question and (item, option) answer is serialized once
+        "answer_json": np.array([[f'"{qid}":"{option}"' for option in OPTIONS] for qid in question_ids], dtype=object),
+        "question_json": np.array([json.dumps({field: dict(q, id=qid)[field] for field in RESULT_QUESTION_FIELDS})
+                                   for q, qid in zip(questions, question_ids)], dtype=object),
+        "id_json": np.array([json.dumps(str(qid)) for qid in question_ids], dtype=object)
+    }
+
+
+_context: Dict[str, Any] = {}
+
+
+def _init_worker(context: Dict[str, Any]):
+    _context.update(context)
+
+
+def generate_batch(batch_index: int, size: int) -> List[Tuple]:
+    """quiz_results rows for one batch, with quiz_data, answers and telemetry as JSON text
+
+    Each batch has its own seed, so the output does not depend on the number of workers.
+    """
+    ctx = _context
+    items = ctx['items']
+    rng = np.random.default_rng([ctx['seed'], batch_index + 1])
+
+    users_idx = rng.choice(len(ctx['user_ids']), size=size, p=ctx['activity'])
+    category = rng.integers(0, ctx['categories'], size=size)
+
+    # Each attempt takes `per_quiz` distinct questions from its category
+    picks = np.argsort(rng.random((size, ctx['per_category'])), axis=1)[:, :ctx['per_quiz']]
+    item_idx = category[:, None] * ctx['per_category'] + picks
+
+    p_correct = 1 / (1 + np.exp(-(ctx['ability'][users_idx][:, None] - items['difficulty'][item_idx])))
+    is_correct = rng.random(item_idx.shape) < p_correct
+    cumulative = items['distractors'][item_idx].cumsum(axis=2)
+    wrong_choice = (rng.random(item_idx.shape + (1,)) > cumulative).sum(axis=2).clip(0, 3)
+    choice = np.where(is_correct, items['correct'][item_idx], wrong_choice)
+    scores = is_correct.mean(axis=1) * 100
+
+    # Telemetry in the packed form written by telemetry.export_telemetry
+    dwell_ms = rng.lognormal(np.log(20000) + 0.4 * items['difficulty'][item_idx], 0.6).clip(1000, 2 ** 32 - 1)
+    dwell_ms = dwell_ms.astype('<u4')
+    changes = rng.poisson(0.15 + 0.5 * ~is_correct).clip(0, 255).astype('u1')
+
+    hour = rng.choice(24, size=size, p=HOURLY_ACTIVITY / HOURLY_ACTIVITY.sum())
+    completed = ctx['start'] + (rng.integers(0, ctx['days'], size) * 86400 + hour * 3600
+                                + rng.integers(0, 3600, size)).astype('timedelta64[s]')
+    started = completed - (dwell_ms.sum(axis=1) // 1000).astype('timedelta64[s]')
+    completed = np.datetime_as_string(completed).tolist()
+    started = np.datetime_as_string(started).tolist()
+    attempt_ids = rng.bytes(16 * size).hex()
+
+    user_ids = ctx['user_ids'][users_idx].tolist()
+    answers = ctx['answer_json'][item_idx, choice].tolist()
+    question_json = ctx['question_json'][item_idx].tolist()
+    id_json = ctx['id_json'][item_idx].tolist()
+    scores = scores.tolist()
+    rows = []
+    for i in range(size):
+        rows.append((
+            user_ids[i],
+            '{"questions":[%s],"bundle_id":null,"event_id":null,"attempt_id":"%s","time_limit":15,"start_time":"%s"}' % (
+                ','.join(question_json[i]), attempt_ids[32 * i:32 * (i + 1)], started[i]
+            ),
+            scores[i],
+            '{%s}' % ','.join(answers[i]),
+            '{"v":1,"question_ids":[%s],"dwell_ms":"%s","changes":"%s"}' % (
+                ','.join(id_json[i]),
+                base64.b64encode(dwell_ms[i].tobytes()).decode('ascii'),
+                base64.b64encode(changes[i].tobytes()).decode('ascii')
+            ),
+            completed[i]
+        ))
+    return rows
+
+
+def attempt_batches(context: Dict[str, Any], attempts: int, batch_size: int, workers: int) -> Iterator[List[Tuple]]:
+    """Yield result batches in order, generating them in worker processes"""
+    sizes = [min(batch_size, attempts - offset) for offset in range(0, attempts, batch_size)]
+    if workers <= 1:
+        _init_worker(context)
+        for batch_index, size in enumerate(sizes):
+            yield generate_batch(batch_index, size)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(context,)) as pool:
+        # Bound the batches in flight so a slow writer does not buffer the whole history
+        pending = deque()
+        for batch_index, size in enumerate(sizes):
+            pending.append(pool.submit(generate_batch, batch_index, size))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class SQLiteTarget:
+    """Local stand-in for the questions and quiz_results tables"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            PRAGMA journal_mode = MEMORY;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY, question TEXT, option_a TEXT, option_b TEXT, option_c TEXT,
+                option_d TEXT, correct_answer TEXT, explanation TEXT, category TEXT, created_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS quiz_results (
+                id INTEGER PRIMARY KEY, user_id TEXT, quiz_data TEXT, score REAL, answers TEXT,
+                telemetry TEXT, completed_at TEXT
+            );
+        """)
+
+    def insert_questions(self, questions):
+        now = datetime.now().isoformat()
+        cursor = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions")
+        first_id = cursor.fetchone()[0] + 1
+        self.conn.executemany(
+            "INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(first_id + i, q['question'], q['option_a'], q['option_b'], q['option_c'], q['option_d'],
+              q['correct_answer'], q['explanation'], q['category'], now) for i, q in enumerate(questions)]
+        )
+        self.conn.commit()
+        return list(range(first_id, first_id + len(questions)))
+
+    def insert_results(self, rows):
+        self.conn.executemany(
+            "INSERT INTO quiz_results (user_id, quiz_data, score, answers, telemetry, completed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
+
+
+class SupabaseTarget:
+    """Writes to the project's Supabase tables in bulk inserts"""
+
+    def __init__(self, chunk_size: int):
+        from dotenv import load_dotenv
+        from supabase import create_client
+        load_dotenv()
+        url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            sys.exit("❌ SUPABASE_URL and SUPABASE_KEY (or SUPABASE_SERVICE_ROLE_KEY) must be set")
+        self.supabase = create_client(url, key)
+        self.chunk_size = chunk_size
+
+    def insert_questions(self, questions):
+        ids = []
+        for i in range(0, len(questions), self.chunk_size):
+            response = self.supabase.table('questions').insert(questions[i:i + self.chunk_size]).execute()
+            ids.extend(row['id'] for row in response.data)
+        if ids:
+            self.check_change_feed(ids[-1])
+        return ids
+
+    def check_change_feed(self, question_id):
+        """Warn if the questions trigger did not log the inserts, since caches would never see them"""
+        response = self.supabase.table('question_changes').select('version') \
+            .eq('question_id', str(question_id)).limit(1).execute()
+        if not response.data:
+            print("⚠️  No question_changes entry for the new questions: install the log_question_change "
+                  "trigger (see change_feed.py) or clear .quiz_data/cache so app caches pick them up")
+
+    def insert_results(self, rows):
+        records = [{
+            "user_id": user_id,
+            "quiz_data": json.loads(quiz_data),
+            "score": score,
+            "answers": json.loads(answers),
+            "telemetry": json.loads(telemetry),
+            "completed_at": completed_at
+        } for user_id, quiz_data, score, answers, telemetry, completed_at in rows]
+        for i in range(0, len(records), self.chunk_size):
+            self.supabase.table('quiz_results').insert(records[i:i + self.chunk_size]).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic question bank and quiz history")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=100, help="questions per category")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--attempts", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=90, help="history length")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=datetime.now().date().isoformat(),
+                        help="last day of the history (default today)")
+    parser.add_argument("--questions-per-quiz", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generator processes")
+    parser.add_argument("--target", choices=["sqlite", "supabase"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=".quiz_data/synthetic.db")
+    parser.add_argument("--supabase-chunk", type=int, default=1000, help="rows per Supabase insert")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.target == "sqlite":
+        os.makedirs(os.path.dirname(args.sqlite_path) or ".", exist_ok=True)
+        target = SQLiteTarget(args.sqlite_path)
+    else:
+        target = SupabaseTarget(args.supabase_chunk)
+
+    print(f"🧠 Generating {args.categories} x {args.questions} questions (seed {args.seed})")
+    started = time.perf_counter()
+    questions, items = generate_questions(rng, args.categories, args.questions)
+    question_ids = target.insert_questions(questions)
+    print(f"✅ {len(question_ids)} questions in {time.perf_counter() - started:.2f}s")
+
+    print(f"📝 Generating {args.attempts} attempts by {args.users} users over {args.days} days")
+    started = time.perf_counter()
+    written = 0
+    context = build_context(args.seed, questions, question_ids, items, args.categories, args.questions,
+                            args.users, args.end_date, args.days, args.questions_per_quiz)
+    for rows in attempt_batches(context, args.attempts, args.batch_size, args.workers):
+        target.insert_results(rows)
+        written += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"   {written} rows ({written / elapsed:,.0f} rows/s)", end="\r")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {written} quiz results in {elapsed:.2f}s ({written / max(elapsed, 1e-9):,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
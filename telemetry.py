@@ -0,0 +1,199 @@
+"""
+Per-question response-time telemetry
+Tracks how long learners dwell on each question and how often they change
+their answer, stores it with the attempt as packed integer arrays, and
+aggregates it into per-item dwell histograms for admin reports.
+"""
+
+import base64
+import sys
+import threading
+import time
+from array import array
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from supabase import Client
+
+from config import config
+from shared_cache import load_questions
+from pagination import IdWatermark
+
+TELEMETRY_VERSION = 1
+# Dwell histogram bin edges in seconds (log spaced, 1s .. ~1h)
+BIN_EDGES = np.geomspace(1, 3600, config.TELEMETRY_HISTOGRAM_BINS)
+
+
+def start_tracking(questions: List[Dict[str, Any]], answers: Dict[str, str]):
+    """Reset telemetry for a new or resumed attempt"""
+    st.session_state.quiz_telemetry = {
+        "question_ids": [str(q['id']) for q in questions],
+        "dwell_ms": [0] * len(questions),
+        "changes": [0] * len(questions),
+        "previous": dict(answers),
+        "last_event": time.time()
+    }
+
+
+def record_answer(question_id: str, widget_key: str):
+    """Answer widget on_change callback: attribute the time since the last interaction to this question
+
+    The answer widgets start with no selection, so every selection is an explicit
+    interaction; only re-selecting an already answered question counts as a change.
+    """
+    telemetry = st.session_state.get('quiz_telemetry')
+    answer = st.session_state.get(widget_key)
+    if not telemetry or answer is None or question_id not in telemetry['question_ids']:
+        return
+
+    now = time.time()
+    index = telemetry['question_ids'].index(question_id)
+    telemetry['dwell_ms'][index] += int((now - telemetry['last_event']) * 1000)
+    previous = telemetry['previous'].get(question_id)
+    if previous is not None and previous != answer:
+        telemetry['changes'][index] += 1
+    telemetry['previous'][question_id] = answer
+    telemetry['last_event'] = now
+
+
+def pack(values: List[int], typecode: str) -> str:
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()  # Always store little endian
+    return base64.b64encode(packed.tobytes()).decode('ascii')
+
+
+def unpack(data: str, dtype: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype)
+
+
+def export_telemetry() -> Optional[Dict[str, Any]]:
+    """Compact form stored with the quiz result"""
+    telemetry = st.session_state.get('quiz_telemetry')
+    if not telemetry:
+        return None
+    return {
+        "v": TELEMETRY_VERSION,
+        "question_ids": telemetry['question_ids'],
+        "dwell_ms": pack([min(ms, 2 ** 32 - 1) for ms in telemetry['dwell_ms']], 'I'),
+        "changes": pack([min(count, 255) for count in telemetry['changes']], 'B')
+    }
+
+
+class DwellHistograms:
+    """Incrementally updated per-item dwell histograms and answer-change totals"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.columns: Dict[str, int] = {}
+        self.histograms = np.zeros((0, len(BIN_EDGES) + 1), dtype=np.int64)
+        self.changes = np.zeros(0, dtype=np.int64)
+        self.watermark = IdWatermark()
+        self.attempts = 0
+
+    def add_results(self, results: List[Dict[str, Any]]):
+        item_ids, dwell, changes = [], [], []
+        for result in results:
+            telemetry = result.get('telemetry')
+            if not telemetry or telemetry.get('v') != TELEMETRY_VERSION:
+                continue
+            item_ids.extend(self.columns.setdefault(qid, len(self.columns)) for qid in telemetry['question_ids'])
+            dwell.append(unpack(telemetry['dwell_ms'], '<u4'))
+            changes.append(unpack(telemetry['changes'], 'u1'))
+            self.attempts += 1
+        if not item_ids:
+            return
+
+        size = len(self.columns)
+        bins = self.histograms.shape[1]
+        if size > self.histograms.shape[0]:
+            extra = size - self.histograms.shape[0]
+            self.histograms = np.vstack([self.histograms, np.zeros((extra, bins), dtype=np.int64)])
+            self.changes = np.concatenate([self.changes, np.zeros(extra, dtype=np.int64)])
+
+        items = np.asarray(item_ids, dtype=np.int64)
+        seconds = np.concatenate(dwell) / 1000.0
+        answered = seconds > 0
+        bin_index = np.searchsorted(BIN_EDGES, seconds[answered])
+        self.histograms += np.bincount(
+            items[answered] * bins + bin_index, minlength=size * bins
+        ).reshape(size, bins)
+        self.changes += np.bincount(items, weights=np.concatenate(changes), minlength=size).astype(np.int64)
+
+    def report(self) -> pd.DataFrame:
+        counts = self.histograms.sum(axis=1)
+        cumulative = self.histograms.cumsum(axis=1)
+        bin_values = np.concatenate([BIN_EDGES, [BIN_EDGES[-1]]])
+
+        def quantile(q):
+            index = (cumulative >= np.maximum(counts, 1)[:, None] * q).argmax(axis=1)
+            return np.where(counts > 0, bin_values[index], np.nan)
+
+        return pd.DataFrame({
+            'question_id': sorted(self.columns, key=self.columns.get),
+            'timed_responses': counts,
+            'median_seconds': quantile(0.5),
+            'p90_seconds': quantile(0.9),
+            'answer_changes': self.changes
+        })
+
+
+@st.cache_resource
+def get_dwell_histograms() -> DwellHistograms:
+    """Get the process-wide dwell aggregation"""
+    return DwellHistograms()
+
+
+def refresh_dwell_histograms(supabase: Client) -> DwellHistograms:
+    """Fold telemetry from results completed since the last refresh"""
+    histograms = get_dwell_histograms()
+    page_size = config.ITEM_ANALYSIS_PAGE_SIZE
+    with histograms.lock:
+        # Read by id like the item analysis, without skipping results that commit late
+        for batch in histograms.watermark.pages(lambda: supabase.table('quiz_results').select('id, telemetry'), page_size):
+            histograms.add_results(batch)
+    return histograms
+
+
+@st.cache_data(ttl=config.ADMIN_REPORT_CACHE_SECONDS, show_spinner=False)
+def build_response_time_report(_supabase: Client) -> Tuple[pd.DataFrame, int]:
+    """The per-question dwell report and timed attempt count, cached across admin reruns"""
+    histograms = refresh_dwell_histograms(_supabase)
+    report = histograms.report()
+    report = report[report['timed_responses'] > 0]
+    if report.empty:
+        return report, histograms.attempts
+
+    details = pd.DataFrame([{
+        'question_id': str(q['id']),
+        'Question': q['question'][:80] + '...' if len(q['question']) > 80 else q['question'],
+        'Category': q['category']
+    } for q in load_questions(_supabase)], columns=['question_id', 'Question', 'Category'])
+    report = details.merge(report, on='question_id')
+
+    typical = report['median_seconds'].median()
+    report['Long dwell'] = report['median_seconds'] > typical * config.TELEMETRY_LONG_DWELL_FACTOR
+    return report, histograms.attempts
+
+
+def render_response_times(supabase: Client):
+    """Admin report of time per question and abnormally long dwell"""
+    st.subheader("⏲️ Response Times")
+
+    try:
+        if st.button("Refresh", key="refresh_response_times"):
+            build_response_time_report.clear()
+        report, attempts = build_response_time_report(supabase)
+        if report.empty:
+            st.info("No response-time data yet.")
+            return
+
+        st.caption(f"Based on {attempts} timed attempts; medians are histogram estimates")
+        st.dataframe(
+            report.drop(columns=['question_id']).sort_values('median_seconds', ascending=False),
+            use_container_width=True
+        )
+    except Exception as e:
+        st.error(f"Error building response-time report: {e}")
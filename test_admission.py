@@ -0,0 +1,28 @@
+"""
+Tests for the admission controller's FIFO queue
+Run with: python -m pytest test_admission.py
+"""
+
+import pytest
+
+from admission import AdmissionController
+
+
+class Interrupted(Exception):
+    """Stands in for Streamlit's rerun/stop exceptions raised from the queue position display"""
+
+
+def test_interrupted_waiter_leaves_the_queue():
+    controller = AdmissionController(global_rate=1, global_burst=1, user_rate=100, user_burst=100,
+                                     max_queue=10, max_wait_seconds=5)
+    controller.acquire("user-1")  # Empty the global bucket, so the next caller waits in line
+
+    def interrupt(position):
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        controller.acquire("user-2", interrupt)
+    assert not controller.queue
+
+    # The next caller reaches the head of the queue and is admitted once a token is free
+    controller.acquire("user-3")
@@ -0,0 +1,203 @@
+"""
+Tests for the quiz flow in app.py, run through Streamlit's AppTest
+Run with: python -m pytest test_app.py
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+import streamlit as st
+import supabase
+from streamlit.testing.v1 import AppTest
+
+import activity_counters
+import admission
+import answer_key
+import autosave
+import exam_scheduler
+import question_bundles
+import reports
+import results_view
+import review_queue
+
+QUESTIONS = [
+    {"id": 1, "question": "Q1", "option_a": "A", "option_b": "B", "option_c": "C", "option_d": "D", "category": "General"},
+    {"id": 2, "question": "Q2", "option_a": "A", "option_b": "B", "option_c": "C", "option_d": "D", "category": "General"},
+]
+ANSWER_KEY = {"1": "b", "2": "a"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Fake Supabase client and stand-ins for the backend calls the quiz flow makes"""
+    client = MagicMock()
+    st.cache_resource.clear()
+    monkeypatch.setenv("SUPABASE_URL", "http://localhost")
+    monkeypatch.setenv("SUPABASE_KEY", "key")
+    monkeypatch.setattr(supabase, 'create_client', lambda url, key: client)
+    monkeypatch.setattr(exam_scheduler, 'get_exam_scheduler', lambda supabase: None)
+    monkeypatch.setattr(exam_scheduler, 'get_user_cohorts', lambda supabase, user_id: ["c1"])
+    monkeypatch.setattr(exam_scheduler, 'get_user_exam_events', lambda supabase, cohorts: [])
+    monkeypatch.setattr(answer_key, 'get_answer_key', lambda supabase, questions, bundle_id=None: ANSWER_KEY)
+    monkeypatch.setattr(results_view, 'get_answer_key', lambda supabase, questions, bundle_id=None: ANSWER_KEY)
+    monkeypatch.setattr(results_view, 'get_explanations', lambda supabase, questions, bundle_id=None: {})
+    monkeypatch.setattr(autosave, 'autosave_attempt', lambda supabase, user_id, immediate=False: None)
+    monkeypatch.setattr(autosave, 'clear_saved_attempt', lambda supabase, user_id: None)
+    monkeypatch.setattr(review_queue, 'record_review_results', lambda *args: None)
+    monkeypatch.setattr(activity_counters, 'record_submission', lambda *args: None)
+    monkeypatch.setattr(reports, 'render_attempt_downloads', lambda *args: None)
+    yield client
+    st.cache_resource.clear()
+
+
+def quiz_app(answers, started_minutes_ago):
+    at = AppTest.from_file("app.py", default_timeout=30)
+    at.session_state.user = SimpleNamespace(id="user-1", email="learner@example.com")
+    at.session_state.current_quiz = {
+        "questions": QUESTIONS,
+        "time_limit": 15,
+        "start_time": datetime.now() - timedelta(minutes=started_minutes_ago),
+        "bundle_id": None,
+        "attempt_id": "attempt-1"
+    }
+    at.session_state.quiz_start_time = time.time() - started_minutes_ago * 60
+    at.session_state.quiz_answers = answers
+    at.session_state.quiz_completed = False
+    return at
+
+
+def saved_results(client):
+    return [call.args[0] for call in client.table.return_value.insert.call_args_list if 'score' in call.args[0]]
+
+
+def test_expired_quiz_without_answers_completes(client):
+    at = quiz_app({}, started_minutes_ago=20).run()
+
+    assert at.session_state.quiz_completed
+    assert not [warning for warning in at.warning if "No quiz to submit" in warning.value]
+    [result] = saved_results(client)
+    assert result['score'] == 0
+    assert result['answers'] == {}
+
+    # The results page shows every question as unanswered
+    at.run()
+    assert any("Your score: 0.0%" in success.value for success in at.success)
+
+
+def test_expired_quiz_scores_the_answers_given(client):
+    at = quiz_app({"1": "b"}, started_minutes_ago=20).run()
+
+    assert at.session_state.quiz_completed
+    [result] = saved_results(client)
+    assert result['score'] == 50
+
+
+EXAM_EVENT = {
+    "id": 7, "name": "Final", "bundle_id": "bundle-1", "cohort": "c1", "duration_minutes": 30,
+    "window_minutes": 60, "stagger_seconds": 0,
+    "starts_at": (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+}
+
+
+def test_submitting_an_exam_marks_the_attempt_submitted(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(exam_scheduler, 'mark_exam_submitted',
+                        lambda supabase, event_id, user_id: submitted.append((event_id, user_id)))
+    at = quiz_app({"1": "b"}, started_minutes_ago=20)
+    at.session_state.current_quiz["event_id"] = EXAM_EVENT["id"]
+    at.run()
+
+    assert at.session_state.quiz_completed
+    assert submitted == [(EXAM_EVENT["id"], "user-1")]
+
+
+def test_submitted_exam_cannot_be_started_again(client, monkeypatch):
+    monkeypatch.setattr(exam_scheduler, 'get_user_exam_events', lambda supabase, cohorts: [EXAM_EVENT])
+    monkeypatch.setattr(exam_scheduler, 'get_exam_attempts',
+                        lambda supabase, user_id, event_ids: {"7": {"status": "submitted"}})
+    monkeypatch.setattr(autosave, 'load_saved_attempt', lambda supabase, user_id: None)
+    at = AppTest.from_file("app.py", default_timeout=30)
+    at.session_state.user = SimpleNamespace(id="user-1", email="learner@example.com")
+    at.run()
+
+    assert not [button for button in at.button if button.label in ("Start Exam", "Resume Exam")]
+    assert any("Final" in success.value and "submitted" in success.value for success in at.success)
+
+
+def test_exam_attempts_are_read_once_per_session(client, monkeypatch):
+    reads = []
+    monkeypatch.setattr(exam_scheduler, 'get_user_exam_events', lambda supabase, cohorts: [EXAM_EVENT])
+    monkeypatch.setattr(exam_scheduler, 'get_exam_attempts',
+                        lambda supabase, user_id, event_ids: reads.append(event_ids) or {})
+    monkeypatch.setattr(autosave, 'load_saved_attempt', lambda supabase, user_id: None)
+    at = AppTest.from_file("app.py", default_timeout=30)
+    at.session_state.user = SimpleNamespace(id="user-1", email="learner@example.com")
+    at.run()
+    at.run()
+
+    assert reads == [[EXAM_EVENT["id"]]]
+    assert [button for button in at.button if button.label == "Start Exam"]
+
+
+def test_started_exam_resumes_with_its_original_timer(client, monkeypatch):
+    started_at = datetime.now(timezone.utc) - timedelta(minutes=10)
+    monkeypatch.setattr(exam_scheduler, 'get_user_exam_events', lambda supabase, cohorts: [EXAM_EVENT])
+    monkeypatch.setattr(exam_scheduler, 'get_exam_attempts', lambda supabase, user_id, event_ids: {
+        "7": {"status": "started", "started_at": started_at.isoformat()}
+    })
+    monkeypatch.setattr(exam_scheduler, 'mark_exam_started', lambda supabase, event, user_id, started_at: None)
+    monkeypatch.setattr(autosave, 'load_saved_attempt', lambda supabase, user_id: None)
+    bundle = MagicMock()
+    bundle.questions.return_value = QUESTIONS
+    monkeypatch.setattr(question_bundles, 'load_bundle', lambda bundle_id: bundle)
+    at = AppTest.from_file("app.py", default_timeout=30)
+    at.session_state.user = SimpleNamespace(id="user-1", email="learner@example.com")
+    at.run()
+
+    [resume] = [button for button in at.button if button.label == "Resume Exam"]
+    resume.click().run()
+    assert at.session_state.current_quiz["event_id"] == EXAM_EVENT["id"]
+    assert at.session_state.quiz_start_time == pytest.approx(started_at.timestamp())
+
+
+def test_failed_save_keeps_the_quiz_open_and_autosaved(client, monkeypatch):
+    cleared = []
+    monkeypatch.setattr(autosave, 'clear_saved_attempt', lambda supabase, user_id: cleared.append(user_id))
+    client.table.return_value.insert.return_value.execute.side_effect = RuntimeError("insert failed")
+    at = quiz_app({"1": "b"}, started_minutes_ago=5).run()
+
+    [submit] = [button for button in at.button if button.label == "Submit Quiz"]
+    submit.click().run()
+
+    assert not at.session_state.quiz_completed
+    assert cleared == []
+    assert any("Error saving quiz result" in error.value for error in at.error)
+
+
+def test_rejected_auto_submit_offers_a_retry(client, monkeypatch):
+    monkeypatch.setattr(admission, 'admit', lambda user_key, action: False)
+    at = quiz_app({"1": "b"}, started_minutes_ago=20).run()
+
+    assert not at.session_state.quiz_completed
+    assert [button for button in at.button if button.label == "Retry submission"]
+
+    monkeypatch.setattr(admission, 'admit', lambda user_key, action: True)
+    [retry] = [button for button in at.button if button.label == "Retry submission"]
+    retry.click().run()
+    assert at.session_state.quiz_completed
+
+
+def test_start_review_is_admitted(client, monkeypatch):
+    monkeypatch.setattr(admission, 'admit', lambda user_key, action: False)
+    monkeypatch.setattr(review_queue, 'get_due_reviews', lambda supabase, user_id: QUESTIONS)
+    monkeypatch.setattr(autosave, 'load_saved_attempt', lambda supabase, user_id: None)
+    at = AppTest.from_file("app.py", default_timeout=30)
+    at.session_state.user = SimpleNamespace(id="user-1", email="learner@example.com")
+    at.run()
+
+    [review] = [button for button in at.button if button.label == "Start Review"]
+    review.click().run()
+    assert not at.session_state.current_quiz
@@ -0,0 +1,74 @@
+"""
+Tests for the question change feed using the in-process change log
+Run with: python -m pytest test_change_feed.py
+"""
+
+from datetime import datetime, timedelta
+
+from config import config
+from change_feed import (
+    LocalChangeLog, make_change, read_changes, safe_latest_version, apply_changes,
+    INSERT, UPDATE, DELETE
+)
+
+
+class PendingChangeLog(LocalChangeLog):
+    """Local log that hides some versions, like writes that have not committed yet"""
+
+    def __init__(self, pending):
+        super().__init__()
+        self.pending = set(pending)
+
+    def since(self, version, limit):
+        return [change for change in super().since(version, limit) if change['version'] not in self.pending]
+
+
+def question(question_id, text):
+    return {"id": question_id, "question": text, "category": "General"}
+
+
+def test_local_log_assigns_versions_in_order():
+    log = LocalChangeLog()
+    assert log.latest_version() == 0
+    assert log.append([make_change(INSERT, 1, question(1, "a")), make_change(INSERT, 2, question(2, "b"))]) == 2
+    assert log.append([make_change(DELETE, 1)]) == 3
+    assert [change['version'] for change in read_changes(log, 0)] == [1, 2, 3]
+    assert [change['version'] for change in read_changes(log, 2)] == [3]
+    assert read_changes(log, 3) == []
+
+
+def test_read_changes_pages_through_the_log(monkeypatch):
+    monkeypatch.setattr(config, 'CHANGE_FEED_PAGE_SIZE', 2)
+    log = LocalChangeLog()
+    log.append([make_change(INSERT, i, question(i, str(i))) for i in range(5)])
+    assert [change['version'] for change in read_changes(log, 0)] == [1, 2, 3, 4, 5]
+
+
+def test_read_changes_stops_at_a_recent_gap():
+    log = PendingChangeLog(pending={2})
+    log.append([make_change(INSERT, i, question(i, str(i))) for i in range(4)])
+    assert [change['version'] for change in read_changes(log, 0)] == [1]
+    assert safe_latest_version(log) == 1
+
+    # Once the slower write commits, the rest of the feed is readable
+    log.pending.clear()
+    assert [change['version'] for change in read_changes(log, 1)] == [2, 3, 4]
+
+
+def test_read_changes_skips_an_expired_gap():
+    log = PendingChangeLog(pending={2})
+    log.append([make_change(INSERT, i, question(i, str(i))) for i in range(4)])
+    later = datetime.now() + timedelta(seconds=config.CHANGE_FEED_GAP_GRACE_SECONDS + 1)
+    assert [change['version'] for change in read_changes(log, 0, now=later)] == [1, 3, 4]
+    assert safe_latest_version(log, now=later) == 4
+
+
+def test_apply_changes_inserts_updates_and_deletes():
+    questions = [question(1, "a"), question(2, "b")]
+    changes = [
+        make_change(UPDATE, 1, question(1, "a2")),
+        make_change(DELETE, 2),
+        make_change(INSERT, 3, question(3, "c")),
+    ]
+    result = {q['id']: q['question'] for q in apply_changes(questions, changes)}
+    assert result == {1: "a2", 3: "c"}
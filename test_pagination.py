@@ -0,0 +1,52 @@
+"""
+Tests for incremental id paging
+Run with: python -m pytest test_pagination.py
+"""
+
+from types import SimpleNamespace
+
+from pagination import IdWatermark
+
+
+class FakeQuery:
+    """Just enough of a PostgREST query over a list of committed ids"""
+
+    def __init__(self, ids):
+        self.ids = sorted(ids)
+
+    def order(self, column):
+        return self
+
+    def gt(self, column, value):
+        self.ids = [row_id for row_id in self.ids if row_id > value]
+        return self
+
+    def limit(self, count):
+        self.ids = self.ids[:count]
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=[{"id": row_id} for row_id in self.ids])
+
+
+def read(watermark, committed, page_size=2):
+    return [row['id'] for page in watermark.pages(lambda: FakeQuery(committed), page_size) for row in page]
+
+
+def test_rows_committed_out_of_id_order_are_read_once():
+    watermark = IdWatermark(grace_seconds=3600)
+    committed = [1, 2, 4, 5]
+    assert read(watermark, committed) == [1, 2, 4, 5]
+    assert watermark.watermark == 2
+
+    # Id 3 commits after 4 and 5 were read
+    committed.append(3)
+    assert read(watermark, committed) == [3]
+    assert watermark.watermark == 5
+    assert read(watermark, committed) == []
+
+
+def test_a_gap_is_given_up_after_the_grace_period():
+    watermark = IdWatermark(grace_seconds=0)
+    assert read(watermark, [1, 3]) == [1, 3]
+    assert watermark.watermark == 3
@@ -0,0 +1,57 @@
+"""
+Tests for the debounced session writer with the in-process session store
+Run with: python -m pytest test_session_store.py
+"""
+
+from session_store import MemorySessionStore, SessionWriter
+
+
+def writer_for(store):
+    # Long debounce, so only flush() writes during a test
+    return SessionWriter(store, debounce_seconds=3600, min_interval_seconds=3600)
+
+
+def test_two_sessions_on_one_worker_conflict():
+    store = MemorySessionStore()
+    writer = writer_for(store)
+    store.save("user-1", b"started", 0)
+
+    # Both tabs read version 1
+    writer.schedule("tab-a", "user-1", b"answered", 1)
+    writer.flush("tab-a")
+    writer.schedule("tab-b", "user-1", b"empty", 1)
+    writer.flush("tab-b")
+
+    assert store.load("user-1") == (2, b"answered")
+    assert writer.take_conflict("tab-b")
+    assert not writer.take_conflict("tab-a")
+    # The stale tab does not inherit the other tab's version, so its next load picks up the newer copy
+    assert writer.version("tab-b", 1) == 1
+    assert writer.version("tab-a", 1) == 2
+
+
+def test_a_session_follows_its_own_writes():
+    store = MemorySessionStore()
+    writer = writer_for(store)
+
+    writer.schedule("tab-a", "user-1", b"first", 0)
+    writer.flush("tab-a")
+    # Scheduled before the session saw the result of its first write
+    writer.schedule("tab-a", "user-1", b"second", 0)
+    writer.flush("tab-a")
+
+    assert store.load("user-1") == (2, b"second")
+    assert not writer.take_conflict("tab-a")
+
+
+def test_pending_blobs_coalesce():
+    store = MemorySessionStore()
+    writer = writer_for(store)
+
+    for blob in (b"one", b"two", b"three"):
+        writer.schedule("tab-a", "user-1", blob, 0)
+    assert writer.has_pending("tab-a")
+    writer.flush("tab-a")
+
+    assert store.load("user-1") == (1, b"three")
+    assert not writer.has_pending("tab-a")